@@ -1,6 +1,6 @@
 from loguru import logger
 from src.config import settings
-from src.raindrop import raindrop_client
+from src.raindrop import get_raindrop_client
 from src.llm import get_provider
 from src.organizer import RaindropOrganizer
 
@@ -9,7 +9,7 @@ def main():
     
     # Init
     llm = get_provider(settings.DEFAULT_LLM_PROVIDER)
-    organizer = RaindropOrganizer(raindrop_client, llm)
+    organizer = RaindropOrganizer(get_raindrop_client(), llm)
     
     # Run
     organizer.run()
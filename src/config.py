@@ -1,47 +1,132 @@
 import os
+from functools import cached_property, lru_cache
 from typing import Optional
 from pathlib import Path
 from pydantic import Field
 from dotenv import load_dotenv
 
-# Load .env file
-load_dotenv()
+@lru_cache(maxsize=None)
+def _load_env() -> bool:
+    """
+    Load the .env file once per process.
+    Re-importing config (e.g. in tests) reuses the already-populated os.environ.
+    """
+    return load_dotenv()
 
 class Settings:
+    # Defaults
+    DEFAULT_LLM_PROVIDER: str = "gemini" 
+
+    def __init__(self):
+        _load_env()
+
+        # Hot fields read inside the per-item loops: materialize once as plain attributes
+        self.DRY_RUN: bool = os.getenv("DRY_RUN", "false").lower() == "true"
+        self.MAX_ITEMS: int = int(os.getenv("MAX_ITEMS", "50"))
+
+    # Everything else is read lazily on first access and cached on the instance.
+
     # Raindrop
-    RAINDROP_TOKEN: str = os.getenv("RAINDROP_TEST_TOKEN", os.getenv("RAINDROP_TOKEN", ""))
-    RAINDROP_COLLECTION_ID: int = int(os.getenv("RAINDROP_COLLECTION_ID", "0"))
-    APP_USER_AGENT: str = os.getenv("APP_USER_AGENT", "RaindropVideoSummarizer/1.0")
+    @cached_property
+    def RAINDROP_TOKEN(self) -> str:
+        return os.getenv("RAINDROP_TEST_TOKEN", os.getenv("RAINDROP_TOKEN", ""))
+
+    @cached_property
+    def RAINDROP_COLLECTION_ID(self) -> int:
+        return int(os.getenv("RAINDROP_COLLECTION_ID", "0"))
+
+    @cached_property
+    def APP_USER_AGENT(self) -> str:
+        return os.getenv("APP_USER_AGENT", "RaindropVideoSummarizer/1.0")
     
     # Readwise
-    READWISE_TOKEN: Optional[str] = os.getenv("READWISE_TOKEN")
+    @cached_property
+    def READWISE_TOKEN(self) -> Optional[str]:
+        return os.getenv("READWISE_TOKEN")
     
     # LLM
-    GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
+    @cached_property
+    def GEMINI_API_KEY(self) -> Optional[str]:
+        return os.getenv("GEMINI_API_KEY")
     
     # Paths
-    OUTPUT_DIR: Path = Path(os.getenv("OUTPUT_DIR", "./output"))
-    DATA_DIR: Path = Path(os.getenv("DATA_DIR", "./data"))
+    @cached_property
+    def OUTPUT_DIR(self) -> Path:
+        return Path(os.getenv("OUTPUT_DIR", "./output"))
+
+    @cached_property
+    def DATA_DIR(self) -> Path:
+        return Path(os.getenv("DATA_DIR", "./data"))
+
+    @cached_property
+    def _data_dir_ready(self) -> Path:
+        self.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        return self.DATA_DIR
+
+    def data_file(self, name: str) -> Path:
+        """
+        Path of a persistent state/cache file in DATA_DIR (the directory is created once).
+        """
+        return self._data_dir_ready / name
     
     # System
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    @cached_property
+    def LOG_LEVEL(self) -> str:
+        return os.getenv("LOG_LEVEL", "INFO")
     
     # Cloudflare R2
-    R2_ACCOUNT_ID: Optional[str] = os.getenv("R2_ACCOUNT_ID")
-    R2_ACCESS_KEY_ID: Optional[str] = os.getenv("R2_ACCESS_KEY_ID")
-    R2_SECRET_ACCESS_KEY: Optional[str] = os.getenv("R2_SECRET_ACCESS_KEY")
-    R2_BUCKET_NAME: Optional[str] = os.getenv("R2_BUCKET_NAME")
-    R2_PUBLIC_DOMAIN: Optional[str] = os.getenv("R2_PUBLIC_DOMAIN")
+    @cached_property
+    def R2_ACCOUNT_ID(self) -> Optional[str]:
+        return os.getenv("R2_ACCOUNT_ID")
+
+    @cached_property
+    def R2_ACCESS_KEY_ID(self) -> Optional[str]:
+        return os.getenv("R2_ACCESS_KEY_ID")
+
+    @cached_property
+    def R2_SECRET_ACCESS_KEY(self) -> Optional[str]:
+        return os.getenv("R2_SECRET_ACCESS_KEY")
+
+    @cached_property
+    def R2_BUCKET_NAME(self) -> Optional[str]:
+        return os.getenv("R2_BUCKET_NAME")
+
+    @cached_property
+    def R2_PUBLIC_DOMAIN(self) -> Optional[str]:
+        return os.getenv("R2_PUBLIC_DOMAIN")
     
-    # Debug Control
-    DRY_RUN: bool = os.getenv("DRY_RUN", "false").lower() == "true"
-    MAX_ITEMS: int = int(os.getenv("MAX_ITEMS", "50"))
+    # Concurrency: number of bookmarks processed in parallel
+    @cached_property
+    def MAX_WORKERS(self) -> int:
+        return max(1, int(os.getenv("MAX_WORKERS", "4")))
     
-    # Feature Flags
-    ENABLE_AUTO_ORGANIZER: bool = os.getenv("ENABLE_AUTO_ORGANIZER", "true").lower() == "true"
+    # Rate limits in requests per minute (0 disables). Bursts up to the limit are allowed.
+    @cached_property
+    def RAINDROP_RATE_LIMIT(self) -> int:
+        return int(os.getenv("RAINDROP_RATE_LIMIT", "60"))
+
+    @cached_property
+    def LLM_RATE_LIMIT(self) -> int:
+        return int(os.getenv("LLM_RATE_LIMIT", "15"))
     
-    # Defaults
-    DEFAULT_LLM_PROVIDER: str = "gemini" 
+    # Feature Flags
+    @cached_property
+    def ENABLE_AUTO_ORGANIZER(self) -> bool:
+        return os.getenv("ENABLE_AUTO_ORGANIZER", "true").lower() == "true"
+
+    # Ask Raindrop to pre-filter listings to likely videos (smaller pages); experimental
+    @cached_property
+    def RAINDROP_SERVER_FILTER(self) -> bool:
+        return os.getenv("RAINDROP_SERVER_FILTER", "false").lower() == "true"
+
+    # Batch Mode (Gemini Batch API: cheaper, but results may take minutes)
+    @cached_property
+    def BATCH_MODE(self) -> bool:
+        return os.getenv("BATCH_MODE", "false").lower() == "true"
+
+    @cached_property
+    def BATCH_TIMEOUT(self) -> int:
+        return int(os.getenv("BATCH_TIMEOUT", "1800"))
 
     def validate(self):
         if not self.RAINDROP_TOKEN:
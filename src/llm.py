@@ -1,12 +1,221 @@
 import abc
+import asyncio
+import hashlib
+import itertools
+import json
 import os
+import random
+import re
+import shelve
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-import google.generativeai as genai
+from typing import List, Optional, Tuple
+import requests
 from loguru import logger
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from .config import settings, DEFAULT_SYSTEM_PROMPT
+from .ratelimit import AsyncRateLimiter
+
+# Visual cue prompts (AI Director Mode)
+_VISUAL_CUE_PROMPT = """
+你是一位專業的影片剪輯師與知識管理專家。
+我會提供一份影片的逐字稿（包含時間戳記）。
+你的任務是找出「畫面上最可能出現高價值資訊（如圖表、數據、關鍵字卡、條列重點）」的時間點。
+
+請忽略：
+1. 講者的純大頭畫面 (Talking head)。
+2. 無意義的過場或玩笑。
+
+請依照以下 JSON 格式回傳 3-5 個最重要的時間點：
+[
+  {
+    "timestamp": 45.5,
+    "reason": "講者提到'這張趨勢圖'，預期有數據圖表"
+  },
+  {
+    "timestamp": 120.0,
+    "reason": "講者開始列點'Step 1'，預期有文字卡"
+  }
+]
+"""
+
+_AUDIO_CUE_PROMPT = """
+你是一位專業的影片剪輯師。
+請根據這段語音內容，判斷講者在什麼時間點「最可能」正在展示重要的視覺資訊（如圖表、清單、示範操作）。
+請尋找語音線索，例如：「如圖所示」、「大家看這張表」、「第一點、第二點」等。
+
+請依照以下 JSON 格式回傳 3-5 個最重要的時間點：
+[
+  {
+    "timestamp": 45.5,
+    "reason": "講者提到'這張圖'，預期有數據圖表"
+  }
+]
+"""
+
+_VIDEO_CUE_PROMPT = """
+你是一位專業的知識影片剪輯師。你的任務是從影片中找出「含金量高」的視覺畫面。
+請分析影片，找出畫面顯示「關鍵資訊」的時間點，例如：
+1. **條列式清單** (Bulleted Lists)
+2. **圖表/數據圖** (Charts/Graphs)
+3. **文字總結卡片** (Summary Cards)
+4. **具體操作步驟畫面** (Step-by-step UI/Process)
+
+**排除原則**：
+- 如果畫面只是「講者大頭照」(Talking Head)，不要截圖。
+- 如果畫面只是「與內容無關的裝飾性動畫或梗圖」，不要截圖。
+- 如果整部影片都沒有上述的高價值畫面，請回傳空陣列 `[]`。
+
+請回傳 JSON 格式：
+[
+  {
+    "timestamp": 12.5,
+    "reason": "出現'核心法則'的三點清單"
+  }
+]
+"""
+
+# Bookmark classification (Organizer)
+_CLASSIFY_PROMPT = """
+You are a highly organized personal librarian.
+Analyze each bookmark you are given and categorize it into ONE of the provided collections.
+
+Instructions:
+1. For each bookmark, select the SINGLE BEST collection ID that fits its content.
+2. If the content fits multiple, choose the most specific one.
+3. If it doesn't fit ANY clearly, use 0.
+4. Return ONLY a JSON array like [{"i": 1, "cid": 123}, {"i": 2, "cid": 0}], one entry per bookmark.
+"""
+
+# JSON-mode configs: Gemini returns bare JSON matching the schema
+_CUE_JSON_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "timestamp": {"type": "NUMBER"},
+                "reason": {"type": "STRING"},
+            },
+            "required": ["timestamp", "reason"],
+        },
+    },
+}
+
+_CLASSIFY_JSON_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "i": {"type": "INTEGER"},
+                "cid": {"type": "INTEGER"},
+            },
+            "required": ["i", "cid"],
+        },
+    },
+}
+
+# Fallback for models that ignore JSON mode and wrap the answer in a markdown fence
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+
+def _parse_json(text: str):
+    """
+    Parse a JSON payload from an LLM response, unwrapping a markdown code fence if present.
+    """
+    match = _JSON_BLOCK.search(text)
+    if match:
+        text = match.group(1)
+    return json.loads(text.strip())
+
+
+# HTTP statuses worth retrying (rate limit, server error, unavailable, deadline exceeded).
+# google.api_core exceptions expose the status as .code
+_TRANSIENT_CODES = {429, 500, 503, 504}
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    return getattr(exc, "code", None) in _TRANSIENT_CODES
+
+
+def _wait_retry_after(retry_state) -> float:
+    """
+    Honor a Retry-After header when the error carries one, otherwise back off exponentially.
+    """
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return _backoff(retry_state)
+
+
+def _log_retry(retry_state):
+    logger.warning(f"Gemini transient error ({retry_state.outcome.exception()}). "
+                   f"Retry {retry_state.attempt_number} in {retry_state.next_action.sleep:.1f}s...")
+
+
+# Retry decorator for Gemini calls; works on both sync and async functions
+_with_retry = retry(
+    retry=retry_if_exception(_is_transient),
+    stop=stop_after_attempt(4),
+    wait=_wait_retry_after,
+    before_sleep=_log_retry,
+    reraise=True,
+)
+
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _to_int(value) -> Optional[int]:
+    """
+    Coerce a model-provided ID to int.
+    Strings like "ID 12" yield the FIRST number only, never all digits concatenated.
+    """
+    if isinstance(value, int):
+        return value
+    if value is None:
+        return None
+    match = _DIGITS_RE.search(str(value))
+    return int(match.group()) if match else None
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to roughly max_tokens.
+    Uses a local estimate rather than a count_tokens round trip:
+    CJK characters count as ~1 token each, everything else as ~1/4 token.
+    """
+    # No character costs more than one token
+    if len(text) <= max_tokens:
+        return text
+    budget = max_tokens * 4  # in quarter-tokens
+    for i, ch in enumerate(text):
+        budget -= 4 if ord(ch) >= 0x2E80 else 1
+        if budget < 0:
+            return text[:i]
+    return text
+
+
+def format_collections(collections: dict) -> str:
+    """
+    Render collections as "ID: Name" lines for classification prompts.
+    Sorted, so the same collections always give the same (cache-friendly) prompt prefix.
+    """
+    return "\n".join(f"{cid}: {cname}" for cid, cname in sorted(collections.items()))
+
 
 class LLMProvider(abc.ABC):
+    # Whether the provider offers an asynchronous (discounted) batch API
+    supports_batch: bool = False
+
     @abc.abstractmethod
     def summarize_text(self, text: str) -> str:
         pass
@@ -23,20 +232,116 @@ class LLMProvider(abc.ABC):
     def classify_bookmark(self, title: str, note: str, collections: dict) -> Optional[int]:
         pass
 
+    def classify_bookmarks_batch(self, items: List[Tuple[str, str]], collections: dict,
+                                 use_batch_api: bool = False,
+                                 collections_block: Optional[str] = None,
+                                 cache_keys: Optional[List[str]] = None) -> List[Optional[int]]:
+        """
+        Classify several (title, note) bookmarks.
+        `collections_block` is an optional pre-rendered format_collections(collections).
+        `cache_keys` optionally identifies each item for providers that cache decisions
+        (by default the title and note).
+        Returns one collection ID (or None) per item, in input order.
+        Default implementation calls classify_bookmark per item; providers can override with a batched prompt.
+        """
+        return [self.classify_bookmark(title, note, collections) for title, note in items]
+
+    async def asummarize_text(self, text: str) -> str:
+        """
+        Async variant of summarize_text. Default implementation runs it in a worker thread.
+        """
+        return await asyncio.to_thread(self.summarize_text, text)
+
+    async def classify_many(self, items: List[Tuple[str, str]], collections: dict,
+                            collections_block: Optional[str] = None,
+                            cache_keys: Optional[List[str]] = None) -> List[Optional[int]]:
+        """
+        Async variant of classify_bookmarks_batch. Default implementation runs it in a worker thread.
+        """
+        return await asyncio.to_thread(self.classify_bookmarks_batch, items, collections,
+                                       collections_block=collections_block, cache_keys=cache_keys)
+
+    def prefetch_upload(self, path: Path):
+        """
+        Hint that `path` will be sent to the model soon. Providers may start uploading it in the background.
+        """
+        pass
+
+    def submit_batch(self, batch_requests: List[dict]) -> str:
+        """
+        Submit generate-content requests to the provider's batch API.
+        Returns a job ID for poll_batch.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batch jobs.")
+
+    def poll_batch(self, job_id: str) -> Optional[List[Optional[str]]]:
+        """
+        Return the response texts (None for failed entries) in request order,
+        or None while the job is still running.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batch jobs.")
+
 class GeminiProvider(LLMProvider):
+    supports_batch = True
+    # Batch jobs are not exposed by google-generativeai, so they go through the REST API
+    API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+    BATCH_POLL_INTERVAL = 30
+    # Gemini deletes uploaded files after 48h; stop reusing them a little earlier
+    UPLOAD_TTL = 47 * 3600
+    # Cap on models printed by the diagnostic listing after a failed call
+    MAX_LISTED_MODELS = 10
+
     def __init__(self):
+        # Imported lazily: google.generativeai pulls in grpc/protobuf/auth,
+        # which we don't want to pay for unless a provider is actually built.
+        import google.generativeai as genai
+        self._genai = genai
+        # (path, mtime_ns, size) -> (upload time, Gemini File handle)
+        self._upload_cache = {}
+        # Background uploads started by prefetch_upload, by the same key
+        self._pending_uploads = {}
+        self._upload_lock = threading.Lock()
+        self._upload_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="gemini-upload")
+        # Model listing is diagnostic only; do it at most once per process
+        self._listed_models_once = False
+        # Shared by the concurrent (async) request paths
+        self._rate_limiter = AsyncRateLimiter(settings.LLM_RATE_LIMIT, 60)
+
         if not settings.GEMINI_API_KEY:
             logger.warning("Gemini API Key not found.")
         else:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
+            self._genai.configure(api_key=settings.GEMINI_API_KEY)
             # Try specific version 
             self.model_name = 'gemini-2.0-flash'
-            self.model = genai.GenerativeModel(self.model_name) 
+            self.model = self._genai.GenerativeModel(self.model_name) 
+            # Fixed system prompts go in system_instruction so they are sent as a reusable prefix
+            model_cls = self._genai.GenerativeModel
+            self._summarize_model = model_cls(self.model_name, system_instruction=DEFAULT_SYSTEM_PROMPT)
+            self._visual_text_model = model_cls(self.model_name, system_instruction=_VISUAL_CUE_PROMPT)
+            self._visual_audio_model = model_cls(self.model_name, system_instruction=_AUDIO_CUE_PROMPT)
+            self._visual_video_model = model_cls(self.model_name, system_instruction=_VIDEO_CUE_PROMPT)
+            self._classify_model = model_cls(self.model_name, system_instruction=_CLASSIFY_PROMPT)
 
     def summarize_text(self, text: str) -> str:
-        prompt = f"{DEFAULT_SYSTEM_PROMPT}\n\n逐字稿內容：\n{text}"
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(self._summarize_model, f"逐字稿內容：\n{text}")
+            return response.text
+        except Exception as e:
+            logger.error(f"Gemini Error on {self.model_name}: {e}")
+            self._log_available_models()
+            raise e
+
+    @_with_retry
+    def _generate(self, model, contents, **kwargs):
+        return model.generate_content(contents, **kwargs)
+
+    @_with_retry
+    async def _agenerate(self, model, contents, **kwargs):
+        return await model.generate_content_async(contents, **kwargs)
+
+    async def asummarize_text(self, text: str) -> str:
+        try:
+            response = await self._agenerate(self._summarize_model, f"逐字稿內容：\n{text}")
             return response.text
         except Exception as e:
             logger.error(f"Gemini Error on {self.model_name}: {e}")
@@ -44,196 +349,151 @@ class GeminiProvider(LLMProvider):
             raise e
 
     def _log_available_models(self):
+        if self._listed_models_once:
+            return
+        self._listed_models_once = True
         try:
             logger.info("Listing available models...")
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    logger.info(f" - {m.name}")
+            # list_models() pages lazily: stop after a few entries, or as soon as the
+            # configured model shows up, instead of walking every page
+            usable = (m for m in self._genai.list_models() if 'generateContent' in m.supported_generation_methods)
+            for m in itertools.islice(usable, self.MAX_LISTED_MODELS):
+                logger.info(f" - {m.name}")
+                if m.name.endswith(f"/{self.model_name}"):
+                    logger.info(f"Configured model {self.model_name} is available.")
+                    break
         except Exception as e:
             logger.error(f"Failed to list models: {e}")
 
-    def analyze_visual_cues(self, transcript_with_timestamps: str) -> list:
+    def _await_file_ready(self, file, initial: float = 0.25, cap: float = 4.0):
         """
-        Analyze transcript to find visual cue timestamps.
-        Returns list of dicts: [{'timestamp': float, 'reason': str}]
+        Poll an uploaded file until Gemini finishes processing it.
+        Uses exponential backoff with jitter so short clips return quickly
+        while long videos don't hammer the API.
         """
-        system_prompt = """
-你是一位專業的影片剪輯師與知識管理專家。
-我會提供一份影片的逐字稿（包含時間戳記）。
-你的任務是找出「畫面上最可能出現高價值資訊（如圖表、數據、關鍵字卡、條列重點）」的時間點。
-
-請忽略：
-1. 講者的純大頭畫面 (Talking head)。
-2. 無意義的過場或玩笑。
+        delay = initial
+        while file.state.name == "PROCESSING":
+            time.sleep(delay + random.uniform(0, delay * 0.1))
+            delay = min(delay * 2, cap)
+            file = self._genai.get_file(file.name)
+        return file
 
-請依照以下 JSON 格式回傳 3-5 個最重要的時間點：
-[
-  {
-    "timestamp": 45.5,
-    "reason": "講者提到'這張趨勢圖'，預期有數據圖表"
-  },
-  {
-    "timestamp": 120.0,
-    "reason": "講者開始列點'Step 1'，預期有文字卡"
-  }
-]
-"""
-        prompt = f"{system_prompt}\n\n逐字稿內容：\n{transcript_with_timestamps}"
+    def _get_or_upload(self, path: Path):
+        """
+        Upload a local file to Gemini and wait until it is ready.
+        Uploads are cached by (path, mtime, size), so the same file is only sent once
+        while the remote copy is still alive. If a prefetch of the file is in flight, waits for it.
+        Raises ValueError if Gemini fails to process the file.
+        """
+        key = self._upload_key(path)
         
+        with self._upload_lock:
+            pending = self._pending_uploads.get(key)
+        if pending is not None:
+            logger.info(f"Waiting for background upload of {path.name}...")
+            return pending.result()
+
+        with self._upload_lock:
+            cached = self._upload_cache.get(key)
+        if cached:
+            uploaded_at, file = cached
+            if time.monotonic() - uploaded_at < self.UPLOAD_TTL:
+                try:
+                    file = self._genai.get_file(file.name)
+                    if file.state.name == "ACTIVE":
+                        logger.info(f"Reusing uploaded file for {path.name}")
+                        return file
+                except Exception as e:
+                    logger.warning(f"Cached upload for {path.name} is gone: {e}")
+            with self._upload_lock:
+                self._upload_cache.pop(key, None)
+
+        return self._upload_now(path, key)
+
+    def prefetch_upload(self, path: Path):
+        """
+        Start uploading `path` in the background so Gemini's processing overlaps other work.
+        Later calls that need the file pick up the same upload.
+        """
+        key = self._upload_key(path)
+        with self._upload_lock:
+            if key in self._upload_cache or key in self._pending_uploads:
+                return
+            logger.info(f"Prefetching upload: {path.name}")
+            self._pending_uploads[key] = self._upload_executor.submit(self._upload_now, path, key)
+
+    @staticmethod
+    def _upload_key(path: Path) -> tuple:
+        stat = path.stat()
+        return (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+    def _upload_now(self, path: Path, key: tuple):
         try:
-            # Force JSON response if possible, or just parse text
-            # Gemini 1.5/2.0 supports response_mime_type="application/json" usually
-            # But let's rely on prompt first for compatibility
-            response = self.model.generate_content(prompt)
-            text = response.text
+            file = self._genai.upload_file(path=path)
+            logger.info("Waiting for file processing...")
+            file = self._await_file_ready(file)
+            if file.state.name == "FAILED":
+                raise ValueError("Gemini file processing failed.")
             
-            # Clean markdown code blocks
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-                
-            import json
-            return json.loads(text.strip())
-        except Exception as e:
-            logger.error(f"Visual Cue Analysis failed: {e}")
-            return []
+            with self._upload_lock:
+                self._upload_cache[key] = (time.monotonic(), file)
+            return file
+        finally:
+            with self._upload_lock:
+                self._pending_uploads.pop(key, None)
+
+    def analyze_visual_cues(self, transcript_with_timestamps: str) -> list:
+        """
+        Analyze transcript to find visual cue timestamps.
+        Returns list of dicts: [{'timestamp': float, 'reason': str}]
+        """
+        return self._analyze_cues(self._visual_text_model, "Visual Cue Analysis",
+                                  text_payload=f"逐字稿內容：\n{transcript_with_timestamps}")
 
     def analyze_visual_cues_from_audio(self, audio_path: Path) -> list:
         """
         Analyze AUDIO to find visual cue timestamps (fallback when no transcript).
         """
-        system_prompt = """
-你是一位專業的影片剪輯師。
-請根據這段語音內容，判斷講者在什麼時間點「最可能」正在展示重要的視覺資訊（如圖表、清單、示範操作）。
-請尋找語音線索，例如：「如圖所示」、「大家看這張表」、「第一點、第二點」等。
-
-請依照以下 JSON 格式回傳 3-5 個最重要的時間點：
-[
-  {
-    "timestamp": 45.5,
-    "reason": "講者提到'這張圖'，預期有數據圖表"
-  }
-]
-"""
-        try:
-            # Re-use the existing file upload logic if possible, or just upload here
-            # Since process_audio uploads it, we might want to cache? 
-            # For simplicity, we upload again or check if we can reuse (Gemini API is stateless unless we manage file lifecycle)
-            # We will just upload/process normally.
-            
-            import time
-            logger.info(f"Uploading audio for Visual Analysis: {audio_path}")
-            audio_file = genai.upload_file(path=audio_path)
-            
-            # Wait for processing
-            while audio_file.state.name == "PROCESSING":
-                time.sleep(1)
-                audio_file = genai.get_file(audio_file.name)
-                
-            if audio_file.state.name == "FAILED":
-                logger.error("Audio processing failed.")
-                return []
-                
-            response = self.model.generate_content([system_prompt, audio_file])
-            text = response.text
-            
-            # Cleanup
-            # genai.delete_file(audio_file.name) # Optional, or let it expire
-            
-            # Parse JSON
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-                
-            import json
-            return json.loads(text.strip())
-            
-        except Exception as e:
-            logger.error(f"Audio Visual Analysis failed: {e}")
-            return []
+        return self._analyze_cues(self._visual_audio_model, "Audio Visual Analysis", media=audio_path)
 
     def analyze_visual_cues_from_video(self, video_path: Path) -> list:
         """
         Analyze VIDEO (Visual + Audio) to find exact timestamps of key slides/charts.
         This is much more accurate than Audio-only analysis.
         """
-        system_prompt = """
-你是一位專業的知識影片剪輯師。你的任務是從影片中找出「含金量高」的視覺畫面。
-請分析影片，找出畫面顯示「關鍵資訊」的時間點，例如：
-1. **條列式清單** (Bulleted Lists)
-2. **圖表/數據圖** (Charts/Graphs)
-3. **文字總結卡片** (Summary Cards)
-4. **具體操作步驟畫面** (Step-by-step UI/Process)
-
-**排除原則**：
-- 如果畫面只是「講者大頭照」(Talking Head)，不要截圖。
-- 如果畫面只是「與內容無關的裝飾性動畫或梗圖」，不要截圖。
-- 如果整部影片都沒有上述的高價值畫面，請回傳空陣列 `[]`。
+        return self._analyze_cues(self._visual_video_model, "Video Visual Analysis", media=video_path)
 
-請回傳 JSON 格式：
-[
-  {
-    "timestamp": 12.5,
-    "reason": "出現'核心法則'的三點清單"
-  }
-]
-"""
+    def _analyze_cues(self, model, label: str, media: Optional[Path] = None, text_payload: Optional[str] = None) -> list:
+        """
+        Shared body of the analyze_visual_cues* methods.
+        `model` carries the matching cue prompt as system instruction; input is either
+        an uploaded media file (shared with other calls via _get_or_upload) or text.
+        Returns [] on any failure.
+        """
         try:
-            import time
-            logger.info(f"Uploading Video to Gemini for Visual Analysis: {video_path.name}...")
-            video_file = genai.upload_file(path=video_path)
-            
-            # Wait for processing (Video takes longer)
-            while video_file.state.name == "PROCESSING":
-                time.sleep(2)
-                video_file = genai.get_file(video_file.name)
-                
-            if video_file.state.name == "FAILED":
-                logger.error("Video processing failed.")
-                return []
-                
-            logger.info("Video processed. Asking Gemini to find timestamps...")
-            response = self.model.generate_content([system_prompt, video_file])
-            text = response.text
-            
-            # Helper to parse JSON
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-                
-            import json
-            return json.loads(text.strip())
+            if media is not None:
+                logger.info(f"Uploading {media.name} to Gemini for {label}...")
+                contents = [self._get_or_upload(media)]
+                logger.info("File processed. Asking Gemini to find timestamps...")
+            else:
+                contents = text_payload
             
+            response = self._generate(model, contents, generation_config=_CUE_JSON_CONFIG)
+            return _parse_json(response.text)
         except Exception as e:
-            logger.error(f"Video Visual Analysis failed: {e}")
+            logger.error(f"{label} failed: {e}")
             return []
 
     def process_audio(self, audio_path: Path) -> str:
-        import time
         logger.info(f"Uploading file to Gemini: {audio_path}")
         try:
-            # Upload file
-            audio_file = genai.upload_file(path=audio_path)
-            
-            # Wait for processing
-            logger.info("Waiting for file processing...")
-            while audio_file.state.name == "PROCESSING":
-                time.sleep(2)
-                audio_file = genai.get_file(audio_file.name)
-                
-            if audio_file.state.name == "FAILED":
-                raise ValueError("Gemini file processing failed.")
+            # Upload file (or reuse a previous upload) and wait for processing
+            audio_file = self._get_or_upload(audio_path)
             
             logger.info("File ready. Generating summary...")
 
-            # Create prompt
-            prompt = f"{DEFAULT_SYSTEM_PROMPT}\n\n(請根據提供的音訊檔進行整理)"
-            
-            # Generate
-            response = self.model.generate_content([prompt, audio_file])
+            # Generate (system prompt is carried by the summarize model)
+            response = self._generate(self._summarize_model, ["(請根據提供的音訊檔進行整理)", audio_file])
             return response.text
         except Exception as e:
             logger.error(f"Gemini processing error: {e}")
@@ -247,61 +507,359 @@ class GeminiProvider(LLMProvider):
         Generate a concise (under 80 chars), descriptive filename-friendly title for this content.
         Do NOT use colons, slashes, or special characters.
         Use spaces or hyphens.
+        Reply with the title only, on a single line.
         
         Original Title: {original_title}
-        Summary: {summary[:1000]}
+        Summary: {_truncate_to_tokens(summary, 400)}
         
         Title:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            # Only the first line is wanted: stop there instead of paying for any explanation
+            response = self._generate(self.model,
+                prompt,
+                generation_config={"stop_sequences": ["\n"], "max_output_tokens": 64}
+            )
+            return response.text.strip() or original_title
         except Exception as e:
             logger.error(f"Title Gen Error: {e}")
             return original_title
 
-    def classify_bookmark(self, title: str, note: str, collections: dict) -> Optional[int]:
+    # Max bookmarks per classification prompt
+    CLASSIFY_BATCH_SIZE = 20
+    # Max classification requests in flight at once (classify_many)
+    CLASSIFY_CONCURRENCY = 8
+    # How long a cached classification stays valid
+    CLASSIFY_CACHE_TTL = 30 * 86400
+    # Output cap per classified bookmark ({"i": n, "cid": id} is ~15 tokens)
+    CLASSIFY_TOKENS_PER_ITEM = 32
+
+    def classify_bookmark(self, title: str, note: str, collections: dict,
+                          collections_block: Optional[str] = None) -> Optional[int]:
         """
         Analyze the bookmark and suggest the best collection ID.
         Returns None if no suitable collection found or uncertain.
         """
-        # Format collections for prompt
-        cols_text = "\n".join([f"{cid}: {cname}" for cid, cname in collections.items()])
+        return self.classify_bookmarks_batch([(title, note)], collections, collections_block=collections_block)[0]
+
+    def classify_bookmarks_batch(self, items: List[Tuple[str, str]], collections: dict,
+                                 use_batch_api: bool = False,
+                                 collections_block: Optional[str] = None,
+                                 cache_keys: Optional[List[str]] = None) -> List[Optional[int]]:
+        """
+        Classify bookmarks with one Gemini request per CLASSIFY_BATCH_SIZE items.
+        With use_batch_api, the requests are sent as a single (discounted) Batch API job instead.
+        Returns one collection ID (or None) per item, in input order.
+        """
+        results, keys = self._lookup_classify_cache(items, collections, cache_keys)
+        misses = [i for i, cid in enumerate(results) if cid is None]
+        if not misses:
+            return results
         
-        prompt = f"""
-        You are a highly organized personal librarian. 
-        Analyze the following bookmark and categorize it into ONE of the provided collections.
+        block = collections_block or format_collections(collections)
+        fresh = self._classify_uncached([items[i] for i in misses], collections, block, use_batch_api)
+        for i, cid in zip(misses, fresh):
+            results[i] = cid
+        self._store_classify_cache({keys[i]: results[i] for i in misses})
+        return results
+
+    def _classify_uncached(self, items: List[Tuple[str, str]], collections: dict,
+                           collections_block: str, use_batch_api: bool) -> List[Optional[int]]:
+        chunks = [items[start:start + self.CLASSIFY_BATCH_SIZE]
+                  for start in range(0, len(items), self.CLASSIFY_BATCH_SIZE)]
         
-        Bookmark Details:
-        - Title: {title}
-        - Note/Excerpt: {note[:500]}
+        if use_batch_api:
+            results = self._classify_via_batch_api(chunks, collections, collections_block)
+            if results is not None:
+                return results
+            logger.warning("Batch classification unavailable. Falling back to direct requests.")
+
+        results = []
+        for chunk in chunks:
+            results.extend(self._classify_chunk(chunk, collections, collections_block))
+        return results
+
+    def _classify_prompt(self, items: List[Tuple[str, str]], collections_block: str) -> str:
+        # One line per bookmark; collapse whitespace so notes can't break the numbering
+        bookmarks_text = "\n".join(
+            f"{i}. {' '.join(title.split())} | {' '.join(_truncate_to_tokens(note, 200).split())}"
+            for i, (title, note) in enumerate(items, start=1)
+        )
         
+        # Instructions live in _CLASSIFY_PROMPT (system instruction); this is just the payload.
+        # Collections go first: they are identical for every request in a run, so the
+        # system prompt + collections form a shared prefix for Gemini's implicit caching.
+        return f"""
         Available Collections (ID: Name):
-        {cols_text}
+        {collections_block}
         
-        Instructions:
-        1. Select the SINGLE BEST collection ID that fits this content.
-        2. If the content fits multiple, choose the most specific one.
-        3. If it doesn't fit ANY clearly, return "0".
-        4. Return ONLY the ID number (integer).
+        Bookmarks (Number. Title | Note/Excerpt):
+        {bookmarks_text}
         """
+
+    def _classify_config(self, count: int) -> dict:
+        # Bound the answer length so a rambling model can't run up output tokens
+        return {**_CLASSIFY_JSON_CONFIG, "max_output_tokens": 64 + count * self.CLASSIFY_TOKENS_PER_ITEM}
+
+    def _classify_chunk(self, items: List[Tuple[str, str]], collections: dict,
+                        collections_block: str) -> List[Optional[int]]:
+        prompt = self._classify_prompt(items, collections_block)
+        try:
+            response = self._generate(self._classify_model,
+                prompt,
+                generation_config=self._classify_config(len(items))
+            )
+            return self._parse_classifications(response.text, len(items), collections)
+        except Exception as e:
+            logger.error(f"Classification Error: {e}")
+            return [None] * len(items)
+
+    async def aclassify_bookmark(self, title: str, note: str, collections: dict,
+                                 collections_block: Optional[str] = None) -> Optional[int]:
+        return (await self.classify_many([(title, note)], collections, collections_block))[0]
+
+    async def classify_many(self, items: List[Tuple[str, str]], collections: dict,
+                            collections_block: Optional[str] = None,
+                            cache_keys: Optional[List[str]] = None) -> List[Optional[int]]:
+        """
+        Classify bookmarks with up to CLASSIFY_CONCURRENCY chunk requests in flight.
+        Returns one collection ID (or None) per item, in input order.
+        """
+        results, keys = self._lookup_classify_cache(items, collections, cache_keys)
+        misses = [i for i, cid in enumerate(results) if cid is None]
+        if not misses:
+            return results
+
+        block = collections_block or format_collections(collections)
+        semaphore = asyncio.Semaphore(self.CLASSIFY_CONCURRENCY)
+
+        async def bounded(chunk):
+            async with semaphore, self._rate_limiter:
+                return await self._aclassify_chunk(chunk, collections, block)
+
+        pending = [items[i] for i in misses]
+        chunks = [pending[start:start + self.CLASSIFY_BATCH_SIZE]
+                  for start in range(0, len(pending), self.CLASSIFY_BATCH_SIZE)]
+        chunk_results = await asyncio.gather(*(bounded(chunk) for chunk in chunks))
+        fresh = [cid for chunk_result in chunk_results for cid in chunk_result]
         
+        for i, cid in zip(misses, fresh):
+            results[i] = cid
+        self._store_classify_cache({keys[i]: results[i] for i in misses})
+        return results
+
+    def _lookup_classify_cache(self, items: List[Tuple[str, str]], collections: dict,
+                               cache_keys: Optional[List[str]] = None) -> Tuple[List[Optional[int]], List[str]]:
+        """
+        Look up previous classifications of the same item (cache_keys, else title + note)
+        against the same collections.
+        Returns (results with cache hits filled in, cache key per item).
+        """
+        collections_sig = repr(sorted(collections.items()))
+        identities = cache_keys or [f"{title}|{note[:500]}" for title, note in items]
+        keys = [
+            hashlib.blake2b(f"{identity}|{collections_sig}".encode(), digest_size=16).hexdigest()
+            for identity in identities
+        ]
+        results: List[Optional[int]] = [None] * len(items)
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.strip()
-            # Cleanup possible markdown or extra chars
-            text = "".join([c for c in text if c.isdigit()])
-            if not text: return None
-            
-            cid = int(text)
-            if cid == 0: return None
-            return cid
-            
+            with shelve.open(str(settings.data_file("classify_cache"))) as cache:
+                now = time.time()
+                for i, key in enumerate(keys):
+                    entry = cache.get(key)
+                    if entry and now - entry[0] < self.CLASSIFY_CACHE_TTL:
+                        results[i] = entry[1]
+        except Exception as e:
+            logger.warning(f"Classification cache unavailable: {e}")
+        
+        hits = sum(cid is not None for cid in results)
+        if hits:
+            logger.info(f"Classification cache: {hits}/{len(items)} hits.")
+        return results, keys
+
+    def _store_classify_cache(self, entries: dict):
+        # Only definite answers are cached; None may just be a transient failure
+        entries = {key: cid for key, cid in entries.items() if cid is not None}
+        if not entries:
+            return
+        try:
+            with shelve.open(str(settings.data_file("classify_cache"))) as cache:
+                now = time.time()
+                for key, cid in entries.items():
+                    cache[key] = (now, cid)
+        except Exception as e:
+            logger.warning(f"Failed to update classification cache: {e}")
+
+    async def _aclassify_chunk(self, items: List[Tuple[str, str]], collections: dict,
+                               collections_block: str) -> List[Optional[int]]:
+        prompt = self._classify_prompt(items, collections_block)
+        try:
+            response = await self._agenerate(self._classify_model,
+                prompt,
+                generation_config=self._classify_config(len(items))
+            )
+            return self._parse_classifications(response.text, len(items), collections)
         except Exception as e:
             logger.error(f"Classification Error: {e}")
+            return [None] * len(items)
+
+    def _classify_via_batch_api(self, chunks: List[List[Tuple[str, str]]], collections: dict,
+                                collections_block: str) -> Optional[List[Optional[int]]]:
+        """
+        Classify all chunks in one Batch API job and wait for it.
+        Returns None if the job could not be submitted or did not finish within BATCH_TIMEOUT.
+        """
+        batch_requests = [
+            {
+                "systemInstruction": {"parts": [{"text": _CLASSIFY_PROMPT}]},
+                "contents": [{"parts": [{"text": self._classify_prompt(chunk, collections_block)}]}],
+                "generationConfig": {
+                    "responseMimeType": _CLASSIFY_JSON_CONFIG["response_mime_type"],
+                    "responseSchema": _CLASSIFY_JSON_CONFIG["response_schema"],
+                    "maxOutputTokens": self._classify_config(len(chunk))["max_output_tokens"],
+                },
+            }
+            for chunk in chunks
+        ]
+        try:
+            job_id = self.submit_batch(batch_requests)
+            texts = self._await_batch(job_id, timeout=settings.BATCH_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Batch classification failed: {e}")
+            return None
+        if texts is None:
+            return None
+
+        results = []
+        for chunk, text in zip(chunks, texts):
+            if text is None:
+                results.extend([None] * len(chunk))
+                continue
+            try:
+                results.extend(self._parse_classifications(text, len(chunk), collections))
+            except Exception as e:
+                logger.error(f"Classification Error: {e}")
+                results.extend([None] * len(chunk))
+        return results
+
+    def _batch_headers(self) -> dict:
+        return {
+            "x-goog-api-key": settings.GEMINI_API_KEY or "",
+            "Content-Type": "application/json",
+        }
+
+    def submit_batch(self, batch_requests: List[dict]) -> str:
+        """
+        Create a Gemini Batch API job with inlined GenerateContent requests.
+        """
+        url = f"{self.API_BASE_URL}/models/{self.model_name}:batchGenerateContent"
+        payload = {
+            "batch": {
+                "displayName": "raindigest",
+                "inputConfig": {
+                    "requests": {
+                        "requests": [
+                            {"request": req, "metadata": {"key": str(i)}}
+                            for i, req in enumerate(batch_requests)
+                        ]
+                    }
+                },
+            }
+        }
+        response = requests.post(url, headers=self._batch_headers(), json=payload)
+        response.raise_for_status()
+        job_id = response.json()["name"]
+        logger.info(f"Submitted Gemini batch job {job_id} ({len(batch_requests)} requests).")
+        return job_id
+
+    def poll_batch(self, job_id: str) -> Optional[List[Optional[str]]]:
+        response = requests.get(f"{self.API_BASE_URL}/{job_id}", headers=self._batch_headers())
+        response.raise_for_status()
+        data = response.json()
+        
+        metadata = data.get("metadata", {})
+        state = metadata.get("state")
+        if state in ("BATCH_STATE_PENDING", "BATCH_STATE_RUNNING"):
             return None
+        if state != "BATCH_STATE_SUCCEEDED":
+            raise RuntimeError(f"Gemini batch job {job_id} ended in state {state}")
+
+        output = metadata.get("output") or data.get("response") or {}
+        entries = output.get("inlinedResponses", {}).get("inlinedResponses", [])
+        
+        texts: List[Optional[str]] = [None] * len(entries)
+        for pos, entry in enumerate(entries):
+            # Responses carry back the key we attached; fall back to position
+            key = entry.get("metadata", {}).get("key")
+            idx = int(key) if key is not None and key.isdigit() else pos
+            if idx >= len(texts):
+                continue
+            if "error" in entry:
+                logger.error(f"Batch request {idx} failed: {entry['error']}")
+                continue
+            try:
+                parts = entry["response"]["candidates"][0]["content"]["parts"]
+                texts[idx] = "".join(part.get("text", "") for part in parts)
+            except (KeyError, IndexError):
+                logger.error(f"Batch request {idx} returned no content.")
+        return texts
+
+    def _await_batch(self, job_id: str, timeout: float) -> Optional[List[Optional[str]]]:
+        """
+        Poll a batch job until it completes. Cancels it and returns None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            texts = self.poll_batch(job_id)
+            if texts is not None:
+                return texts
+            if time.monotonic() >= deadline:
+                logger.warning(f"Gemini batch job {job_id} not finished after {timeout}s. Cancelling.")
+                try:
+                    requests.post(f"{self.API_BASE_URL}/{job_id}:cancel", headers=self._batch_headers())
+                except Exception as e:
+                    logger.error(f"Failed to cancel batch job {job_id}: {e}")
+                return None
+            time.sleep(self.BATCH_POLL_INTERVAL)
+
+    @staticmethod
+    def _parse_classifications(text: str, count: int, collections: dict) -> List[Optional[int]]:
+        """
+        Map the model's [{"i": n, "cid": id}, ...] answer back to input order.
+        Missing, zero or malformed entries become None, and so do IDs that are not
+        in `collections`, so a hallucinated ID is never cached.
+        """
+        results = [None] * count
+        for entry in _parse_json(text):
+            if not isinstance(entry, dict):
+                continue
+            i = _to_int(entry.get("i"))
+            cid = _to_int(entry.get("cid"))
+            if i is None or not cid or not 1 <= i <= count:
+                continue
+            if cid not in collections:
+                logger.warning(f"Model returned unknown collection ID {cid}; ignoring it.")
+                continue
+            results[i - 1] = cid
+        return results
+
+
+_PROVIDER_CLASSES = {"gemini": GeminiProvider}
+_providers: dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
 
 
 def get_provider(name: str = "gemini") -> LLMProvider:
-    return GeminiProvider()
+    """
+    Return the shared provider instance for `name`.
+    Cached so the SDK is configured and the model handle built only once per process.
+    """
+    key = (name or "gemini").strip().lower()
+    if key not in _PROVIDER_CLASSES:
+        logger.warning(f"Unknown LLM provider '{name}', using gemini.")
+        key = "gemini"
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = _PROVIDER_CLASSES[key]()
+        return _providers[key]
@@ -1,28 +1,99 @@
 import json
+import asyncio
+import re
+import hashlib
+import markdown
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+from typing import Optional
 from loguru import logger
 from datetime import datetime
 from .config import settings
-from .raindrop import raindrop_client
+from .raindrop import get_raindrop_client
+from .readwise import readwise_client
+from .storage import get_r2_storage
 from .media import VideoProcessor
 from .llm import get_provider
 
-HISTORY_FILE = settings.DATA_DIR / "history.json"
+# Anything but letters/digits (any script), space, '-' and '_' is dropped from output titles
+_UNSAFE_TITLE_CHARS = re.compile(r"[^\w \-]")
+
+# Append-only: one JSON-encoded bookmark id per line
+HISTORY_FILE = settings.DATA_DIR / "history.jsonl"
+# Pre-JSONL format (a single JSON list), migrated on first load
+LEGACY_HISTORY_FILE = settings.DATA_DIR / "history.json"
 
 def load_history() -> set:
+    history = set()
     if HISTORY_FILE.exists():
+        ends_with_newline = True
+        with open(HISTORY_FILE, "r") as f:
+            for line in f:
+                ends_with_newline = line.endswith("\n")
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    history.add(json.loads(line))
+                except json.JSONDecodeError:
+                    # Tolerate a torn last line from an interrupted run
+                    continue
+        if not ends_with_newline:
+            # Terminate the torn line so the next append starts on a line of its own
+            with open(HISTORY_FILE, "a") as f:
+                f.write("\n")
+
+    if LEGACY_HISTORY_FILE.exists():
         try:
-            with open(HISTORY_FILE, "r") as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
+            with open(LEGACY_HISTORY_FILE, "r") as f:
+                legacy = set(json.load(f))
+            with open(HISTORY_FILE, "a") as f:
+                f.writelines(json.dumps(r_id) + "\n" for r_id in legacy - history)
+            history |= legacy
+            LEGACY_HISTORY_FILE.rename(LEGACY_HISTORY_FILE.with_suffix(".json.migrated"))
+            logger.info(f"Migrated {len(legacy)} history entries to {HISTORY_FILE.name}")
+        except Exception as e:
+            logger.warning(f"Failed to migrate legacy history: {e}")
+    return history
+
+def append_history(r_id):
+    with open(HISTORY_FILE, "a") as f:
+        f.write(json.dumps(r_id) + "\n")
+
+# Per-thread markdown.Markdown instances (they are stateful, so not shared across workers)
+_md_local = threading.local()
 
-def save_history(history: set):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(list(history), f)
+def render_markdown(text: str) -> str:
+    """
+    Convert Markdown to HTML with this thread's cached converter.
+    Extensions: extra (tables, footnotes), nl2br (newlines to br)
+    """
+    md = getattr(_md_local, "md", None)
+    if md is None:
+        md = _md_local.md = markdown.Markdown(extensions=['extra', 'nl2br'])
+    return md.reset().convert(text)
+
+def upload_frame(f_path: Path) -> Optional[str]:
+    """
+    Upload a captured frame to R2 and delete the local copy on success.
+    Returns the public URL, or None if the upload failed.
+    """
+    # Use Content Hash for Filename to allow deduplication/caching
+    with open(f_path, 'rb') as fh:
+        file_hash = hashlib.file_digest(fh, 'blake2b').hexdigest()[:16]
+    object_key = f"images/{file_hash}.jpg"
+
+    public_url = get_r2_storage().upload_file(f_path, object_key)
+
+    if public_url:
+        # Remove local file to save space
+        if f_path.exists():
+            os.remove(f_path)
+        logger.info(f"Uploaded & Deleted: {f_path.name} -> {object_key}")
+    return public_url
 
 def main():
     logger.info("Starting Raindrop Video Summarizer...")
@@ -31,6 +102,7 @@ def main():
     history = load_history()
     video_processor = VideoProcessor()
     llm = get_provider(settings.DEFAULT_LLM_PROVIDER)
+    raindrop_client = get_raindrop_client()
     
     # 2. Fetch
     # 2.1 Auto-Classify Unsorted (Beta)
@@ -47,266 +119,331 @@ def main():
     logger.info(f"Found {len(collections)} collections to process (skipping Unsorted).")
     
     # 2.5 Run Cleanup (once per run)
-    from .storage import r2_storage
+    r2_storage = get_r2_storage()
     if r2_storage.enabled:
         r2_storage.cleanup_old_files(retention_days=30)
     
     # Global processed counter
     processed_count = 0
+    history_lock = threading.Lock()
     
-    for c_id, c_title in collections.items():
-        # Check global limit before starting collection
-        if settings.MAX_ITEMS > 0 and processed_count >= settings.MAX_ITEMS:
-            logger.info(f"Reached MAX_ITEMS ({settings.MAX_ITEMS}). Stopping.")
-            break
-
-        logger.info(f"--- Collection: {c_title} [{c_id}] ---")
-        
-        candidates = raindrop_client.get_candidate_bookmarks(collection_id=c_id)
-        new_candidates = [c for c in candidates if c['_id'] not in history]
-        
-        logger.info(f"Unprocessed in '{c_title}': {len(new_candidates)}")
-        
-        for item in new_candidates:
-            # Check Global Limit per item
-            if settings.MAX_ITEMS > 0 and processed_count >= settings.MAX_ITEMS:
+    def limit_reached(count: int) -> bool:
+        return settings.MAX_ITEMS > 0 and count >= settings.MAX_ITEMS
+    
+    # Items are I/O bound (downloads, LLM and API calls), so process several at once.
+    # Post-processing (Raindrop tag update, history, audio cleanup) runs on its own small
+    # pool so workers can move on; leaving the block waits for it to drain.
+    with ThreadPoolExecutor(max_workers=2) as finalize_executor, \
+         ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+        for c_id, c_title in collections.items():
+            # Check global limit before starting collection
+            if limit_reached(processed_count):
                 logger.info(f"Reached MAX_ITEMS ({settings.MAX_ITEMS}). Stopping.")
                 break
 
-            r_id = item['_id']
-            raindrop_title = item.get('title', 'Untitled')
-            url = item.get('link')
+            logger.info(f"--- Collection: {c_title} [{c_id}] ---")
             
-            logger.info(f"Processing ({processed_count + 1}/{settings.MAX_ITEMS}): {raindrop_title} ({url})")
+            # Pages are fetched concurrently until enough unprocessed items are found for the
+            # remaining MAX_ITEMS, so older unprocessed items aren't missed
+            remaining = settings.MAX_ITEMS - processed_count if settings.MAX_ITEMS > 0 else None
+            new_candidates = asyncio.run(raindrop_client.get_all_candidates(
+                collection_id=c_id, exclude=history, limit=remaining))
+            new_candidates = unique_videos(new_candidates, video_processor)
             
-            # DRY RUN Check
-            if settings.DRY_RUN:
-                if video_processor.verify_url(url):
-                    logger.success(f"[DRY RUN] Valid: {url}")
-                    # Increment count for dry run too, to test limit logic
-                    processed_count += 1
-                continue
-
-            # 3. Verify Video
-            if not video_processor.verify_url(url):
-                logger.warning(f"Skipping value: {url}")
-                continue
+            logger.info(f"Unprocessed in '{c_title}': {len(new_candidates)}")
+            
+            queue = iter(new_candidates)
+            pending = set()
+            while True:
+                # Keep up to MAX_WORKERS items in flight, never more than MAX_ITEMS allows
+                while len(pending) < settings.MAX_WORKERS and not limit_reached(processed_count + len(pending)):
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    pending.add(executor.submit(process_item, item, c_title, video_processor, llm,
+                                                 history, history_lock, finalize_executor))
+                
+                if not pending:
+                    break
                 
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        if future.result():
+                            processed_count += 1
+                    except Exception as e:
+                        logger.error(f"Worker failed: {e}")
+                        
+            logger.info(f"Processed so far: {processed_count}/{settings.MAX_ITEMS}")
+
+def unique_videos(candidates: list, video_processor: VideoProcessor) -> list:
+    """
+    Keep the first bookmark per video. Bookmarks of the same video (e.g. youtube.com/watch?v=X
+    and youtu.be/X) would share download, temp and frame paths on concurrent workers.
+    The others stay unprocessed and are picked up by a later run.
+    """
+    seen = set()
+    unique = []
+    for item in candidates:
+        link = item.get('link')
+        key = video_processor.video_key(link) if link else f"id:{item['_id']}"
+        if key in seen:
+            logger.info(f"Skipping duplicate of video {key} for now: {item.get('title', 'Untitled')}")
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
+
+def process_item(item: dict, c_title: str, video_processor: VideoProcessor, llm,
+                 history: set, history_lock: threading.Lock,
+                 finalize_executor: ThreadPoolExecutor) -> bool:
+    """
+    Summarize a single bookmark end to end. Runs on a worker thread.
+    Returns True if the item counts towards MAX_ITEMS.
+    """
+    r_id = item['_id']
+    raindrop_title = item.get('title', 'Untitled')
+    url = item.get('link')
+    
+    logger.info(f"Processing: {raindrop_title} ({url})")
+    
+    # DRY RUN Check
+    if settings.DRY_RUN:
+        if video_processor.verify_url(url):
+            logger.success(f"[DRY RUN] Valid: {url}")
+            # Count dry runs too, to test limit logic
+            return True
+        return False
+
+    # 3. Verify Video
+    if not video_processor.verify_url(url):
+        logger.warning(f"Skipping value: {url}")
+        return False
+        
+    try:
+        # 4. Process Media (short videos are downloaded once, for both audio and Director Mode)
+        transcript, audio_path, meta, video_path = video_processor.process_with_video(url)
+        
+        if not transcript and not audio_path:
+            logger.error("Failed to get media.")
+            if video_path and video_path.exists():
+                os.remove(video_path)
+            return False
+        
+        # No subtitles: the summary will come from audio, so start uploading it now
+        # and let Gemini process it while Director Mode runs
+        if not transcript and audio_path:
+            llm.prefetch_upload(audio_path)
+        
+        # 5. LLM Summarize
+        summary = ""
+        images_md = ""
+        images_html_block = ""
+
+        # --- AI Director Mode (beta) ---
+        # Only for videos < 10 mins to save bandwidth/time
+        video_id = meta.get('id')
+        duration_sec = meta.get('duration', 0)
+        
+        if video_id and duration_sec > 0 and duration_sec < video_processor.DIRECTOR_MAX_DURATION:
+            logger.info("🎬 Entering AI Director Mode...")
             try:
-                # 4. Process Media
-                transcript, audio_path, meta = video_processor.process(url)
+                # 1. Init vars
+                visual_cues = []
+                temp_vid_path = video_path
                 
-                if not transcript and not audio_path:
-                    logger.error("Failed to get media.")
-                    continue
+                # 2. Strategy Selection
+                raw_transcript = video_processor.get_transcript_with_timestamps(video_id)
                 
-                # 5. LLM Summarize
-                summary = ""
-                images_md = ""
-                images_html_block = ""
+                if raw_transcript:
+                    # Strategy A: Text Analysis (Fast, if subs exist)
+                    logger.info("Analyzing Transcript for Visual Cues...")
+                    visual_cues = llm.analyze_visual_cues(raw_transcript)
+                    
+                    if visual_cues:
+                        # We have cues, NOW download the video to capture them
+                        if not temp_vid_path:
+                            logger.info(f"Found {len(visual_cues)} cues. Downloading video...")
+                            temp_vid_path = video_processor.download_video_temp(url, video_id)
+                        
+                else:
+                    # Strategy B: Video Analysis (Accurate, Fallback for FB/Reels)
+                    if not temp_vid_path:
+                        logger.info("No transcript found. Downloading Video for Visual Analysis...")
+                        temp_vid_path = video_processor.download_video_temp(url, video_id)
+                    
+                    if temp_vid_path and temp_vid_path.exists():
+                        logger.info("Video downloaded. Asking AI to watch and find highlights...")
+                        visual_cues = llm.analyze_visual_cues_from_video(temp_vid_path)
 
-                # --- AI Director Mode (beta) ---
-                # Only for videos < 10 mins to save bandwidth/time
-                video_id = meta.get('id')
-                duration_sec = meta.get('duration', 0)
+                # 3. Execution (Capture)
+                logger.info(f"AI Final Decision: {len(visual_cues)} visual cues found.")
                 
-                if video_id and duration_sec > 0 and duration_sec < 600:
-                    logger.info("🎬 Entering AI Director Mode...")
-                if video_id and duration_sec > 0 and duration_sec < 600:
-                    logger.info("🎬 Entering AI Director Mode...")
-                    try:
-                        # 1. Init vars
-                        visual_cues = []
-                        temp_vid_path = None
+                if visual_cues and temp_vid_path and temp_vid_path.exists():
+                    # 4. Capture Frames
+                    frames_dir = settings.OUTPUT_DIR / "images" / video_id
+                    frames = video_processor.capture_best_frames(temp_vid_path, visual_cues, frames_dir)
+                    logger.info(f"Captured {len(frames)} frames.")
+                    
+                    # 5. Cleanup Video (Only if we are done with it)
+                    # Actually we delete it at the end of this block usually
+                    
+                    # 6. Upload to R2 and Delete Local
+                    if frames:
+                        md_parts = ["\n\n## 🎬 Visual Highlights\n"]
                         
-                        # 2. Strategy Selection
-                        raw_transcript = video_processor.get_transcript_with_timestamps(video_id)
+                        # For Readwise HTML
+                        html_parts = ["<h3>🎬 Visual Highlights</h3>"]
                         
-                        if raw_transcript:
-                            # Strategy A: Text Analysis (Fast, if subs exist)
-                            logger.info("Analyzing Transcript for Visual Cues...")
-                            visual_cues = llm.analyze_visual_cues(raw_transcript)
-                            
-                            if visual_cues:
-                                # We have cues, NOW download the video to capture them
-                                logger.info(f"Found {len(visual_cues)} cues. Downloading video...")
-                                temp_vid_path = video_processor.download_video_temp(url)
-                                
-                        else:
-                            # Strategy B: Video Analysis (Accurate, Fallback for FB/Reels)
-                            logger.info("No transcript found. Downloading Video for Visual Analysis...")
-                            temp_vid_path = video_processor.download_video_temp(url)
-                            
-                            if temp_vid_path and temp_vid_path.exists():
-                                logger.info("Video downloaded. Asking AI to watch and find highlights...")
-                                visual_cues = llm.analyze_visual_cues_from_video(temp_vid_path)
+                        frame_paths = [Path(p) for p in frames]
 
-                        # 3. Execution (Capture)
-                        logger.info(f"AI Final Decision: {len(visual_cues)} visual cues found.")
-                        
-                        if visual_cues and temp_vid_path and temp_vid_path.exists():
-                                    # 4. Capture Frames
-                                    frames_dir = settings.OUTPUT_DIR / "images" / video_id
-                                    frames = video_processor.capture_best_frames(temp_vid_path, visual_cues, frames_dir)
-                                    logger.info(f"Captured {len(frames)} frames.")
-                                    
-                                    # 5. Cleanup Video (Only if we are done with it)
-                                    # Actually we delete it at the end of this block usually
-                                    
-                                    # 6. Upload to R2 and Delete Local
-                                    from .storage import r2_storage
-                                    import hashlib
-                                    
-                                    if frames:
-                                        images_md = "\n\n## 🎬 Visual Highlights\n"
-                                        
-                                        # For Readwise HTML
-                                        images_html_block = "<h3>🎬 Visual Highlights</h3>"
-                                        
-                                        for frame_path_str in frames:
-                                            f_path = Path(frame_path_str)
-                                            
-                                            # Default to local path for detailed Markdown
-                                            rel_path = f_path.relative_to(settings.OUTPUT_DIR)
-                                            link_url = str(rel_path) 
-                                            
-                                            # Attempt R2 Upload
-                                            if r2_storage.enabled:
-                                                # Use Content Hash for Filename to allow deduplication/caching
-                                                file_hash = hashlib.md5(f_path.read_bytes()).hexdigest()
-                                                object_key = f"images/{file_hash}.jpg"
-                                                
-                                                public_url = r2_storage.upload_file(f_path, object_key)
-                                                
-                                                if public_url:
-                                                    link_url = public_url
-                                                    # Remove local file to save space
-                                                    if f_path.exists():
-                                                        os.remove(f_path)
-                                                    logger.info(f"Uploaded & Deleted: {f_path.name} -> {object_key}")
-                                            
-                                            # Append to outputs
-                                            images_md += f"![Key Frame]({link_url})\n"
-                                            images_html_block += f'<img src="{link_url}" alt="Key Frame" style="max-width:100%; margin-top:10px; border-radius:8px;"><br>'
-                                        
-                                        images_html_block += "<hr>"
+                        # Attempt R2 Upload (PUTs are latency-bound, so run them in parallel)
+                        public_urls = [None] * len(frame_paths)
+                        r2_storage = get_r2_storage()
+                        if r2_storage.enabled:
+                            with ThreadPoolExecutor(max_workers=r2_storage.UPLOAD_WORKERS) as upload_executor:
+                                public_urls = list(upload_executor.map(upload_frame, frame_paths))
 
-                                        # Clean up empty dir if all deleted
-                                        if r2_storage.enabled:
-                                            try:
-                                                frames_dir.rmdir() 
-                                            except: 
-                                                pass
+                        # Iterate in cue order so the markdown stays deterministic
+                        for f_path, public_url in zip(frame_paths, public_urls):
+                            # Default to local path for detailed Markdown
+                            link_url = public_url or str(f_path.relative_to(settings.OUTPUT_DIR))
 
-                        # Final Cleanup of temp video
-                        if temp_vid_path and temp_vid_path.exists():
-                            os.remove(temp_vid_path)
-                            
-                    except Exception as e:
-                        logger.error(f"AI Director Mode failed: {e}")
-                # -------------------------------
-                # -------------------------------
+                            # Append to outputs
+                            md_parts.append(f"![Key Frame]({link_url})\n")
+                            html_parts.append(f'<img src="{link_url}" alt="Key Frame" style="max-width:100%; margin-top:10px; border-radius:8px;"><br>')
+                        
+                        html_parts.append("<hr>")
+                        images_md = "".join(md_parts)
+                        images_html_block = "".join(html_parts)
 
-                if transcript:
-                    summary = llm.summarize_text(transcript)
-                elif audio_path:
-                    summary = llm.process_audio(audio_path)
-                
-                # 6. Prepare Output Metadata
-                # Re-extract to ensure scope availability
-                duration_sec = meta.get('duration', 0)
-                uploader = meta.get('uploader', 'Unknown')
-                
-                # AI Title Generation
-                logger.info("Generating concise title...")
-                ai_title = llm.generate_concise_title(summary, raindrop_title)
-                logger.info(f"AI Title: {ai_title}")
-                
-                # Filename Type Logic
-                # > 8 mins (480s) = Video, else Short
-                type_prefix = "[Video]" if duration_sec > 480 else "[Short]"
-                
-                def sanitize(s): return "".join([c for c in s if c.isalnum() or c in (' ','-','_')]).strip()
-                
-                # Use AI Title instead of raw title
-                final_title_str = f"{type_prefix} {sanitize(ai_title)} - {sanitize(uploader)}"
-                
-                # Truncate if too long (max 100 to be safe logic?)
-                if len(final_title_str) > 100:
-                    final_title_str = final_title_str[:100]
-                
-                filename = f"{final_title_str}.md"
-                output_path = settings.OUTPUT_DIR / filename
+                        # Clean up empty dir if all deleted
+                        if r2_storage.enabled:
+                            try:
+                                frames_dir.rmdir() 
+                            except: 
+                                pass
 
-                
-                # Markdown Content: Header -> Images -> Summary
-                md_content = f"# {raindrop_title}\n\n**Source**: {url}\n**Author**: {uploader}\n**Collection**: {c_title}\n"
-                
-                if images_md:
-                     md_content += images_md
-                
-                md_content += f"\n{summary}"
-                
-                # Save Local
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(md_content)
-                logger.success(f"Saved: {output_path}")
-                
-                # 7. Save to Readwise
-                from .readwise import readwise_client
-                import markdown
-                
-                # Convert Markdown to HTML for Reader API
-                # Extensions: extra (tables, footnotes), nl2br (newlines to br)
-                html_rendered_summary = markdown.markdown(summary, extensions=['extra', 'nl2br'])
-                
-                # Add Metadata header to HTML
-                html_header = f"""
-                <p><strong>Source:</strong> <a href="{url}">{url}</a></p>
-                <p><strong>Author:</strong> {uploader}</p>
-                <p><strong>Collection:</strong> {c_title}</p>
-                <hr>
-                """
-                
-                # HTML Content: Header -> Images -> Summary
-                final_html_body = html_header
-                if 'images_html_block' in locals() and images_html_block:
-                    final_html_body += images_html_block
-                
-                final_html_body += html_rendered_summary
-                
-                # Extract Cover Image
-                cover_url = item.get('cover')
-                
-                readwise_client.save_summary(
-                    url=url,
-                    title=final_title_str,
-                    summary_html=final_html_body,
-                    tags=[c_title], # Tags: Collection Name Only
-                    author=uploader,
-                    image_url=cover_url
-                )
-                
-                # 8. Update Raindrop
-                existing_tags = item.get("tags", [])
-                new_tags = list(set(existing_tags + ["summarized"]))
-                raindrop_client.update_bookmark(r_id, tags=new_tags)
-                
-                # 9. Mark Done
-                history.add(r_id)
-                save_history(history)
-                
-                # Increment Counter (Count as processed since we saved results)
-                processed_count += 1
-                
-                # Cleanup
-                if audio_path and audio_path.exists():
-                    os.remove(audio_path)
-                    logger.info(f"Deleted audio file: {audio_path.name}")
+                # Final Cleanup of temp video
+                if temp_vid_path and temp_vid_path.exists():
+                    os.remove(temp_vid_path)
                     
             except Exception as e:
-                logger.error(f"Error processing {raindrop_title}: {e}")
-                continue
+                logger.error(f"AI Director Mode failed: {e}")
+
+        # The video downloaded by process_with_video is only needed for Director Mode
+        if video_path and video_path.exists():
+            os.remove(video_path)
+        # -------------------------------
+
+        if transcript:
+            summary = llm.summarize_text(transcript)
+        elif audio_path:
+            summary = llm.process_audio(audio_path)
+        
+        # 6. Prepare Output Metadata
+        # Re-extract to ensure scope availability
+        duration_sec = meta.get('duration', 0)
+        uploader = meta.get('uploader', 'Unknown')
+        
+        # AI Title Generation
+        logger.info("Generating concise title...")
+        ai_title = llm.generate_concise_title(summary, raindrop_title)
+        logger.info(f"AI Title: {ai_title}")
+        
+        # Filename Type Logic
+        # > 8 mins (480s) = Video, else Short
+        type_prefix = "[Video]" if duration_sec > 480 else "[Short]"
+        
+        def sanitize(s): return _UNSAFE_TITLE_CHARS.sub("", s).strip()
+        
+        # Use AI Title instead of raw title
+        final_title_str = f"{type_prefix} {sanitize(ai_title)} - {sanitize(uploader)}"
+        
+        # Truncate if too long (max 100 to be safe logic?)
+        if len(final_title_str) > 100:
+            final_title_str = final_title_str[:100]
+        
+        filename = f"{final_title_str}.md"
+        output_path = settings.OUTPUT_DIR / filename
+
+        
+        # Markdown Content: Header -> Images -> Summary
+        md_content = f"# {raindrop_title}\n\n**Source**: {url}\n**Author**: {uploader}\n**Collection**: {c_title}\n"
+        
+        if images_md:
+             md_content += images_md
+        
+        md_content += f"\n{summary}"
+        
+        # Save Local
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(md_content)
+        logger.success(f"Saved: {output_path}")
+        
+        # 7. Save to Readwise
+        # Convert Markdown to HTML for Reader API
+        html_rendered_summary = render_markdown(summary)
+        
+        # Add Metadata header to HTML
+        html_header = f"""
+        <p><strong>Source:</strong> <a href="{url}">{url}</a></p>
+        <p><strong>Author:</strong> {uploader}</p>
+        <p><strong>Collection:</strong> {c_title}</p>
+        <hr>
+        """
+        
+        # HTML Content: Header -> Images -> Summary
+        final_html_body = html_header
+        if 'images_html_block' in locals() and images_html_block:
+            final_html_body += images_html_block
+        
+        final_html_body += html_rendered_summary
+        
+        # Extract Cover Image
+        cover_url = item.get('cover')
+        
+        readwise_client.save_summary(
+            url=url,
+            title=final_title_str,
+            summary_html=final_html_body,
+            tags=[c_title], # Tags: Collection Name Only
+            author=uploader,
+            image_url=cover_url
+        )
+        
+        # 8-9. Update Raindrop, mark done and clean up in the background.
+        # The id goes into the in-memory set now so it can't be picked up twice this run.
+        with history_lock:
+            history.add(r_id)
+        finalize_executor.submit(finalize_item, r_id, audio_path, history_lock)
+        
+        # Count as processed since we saved results
+        return True
+            
+    except Exception as e:
+        logger.error(f"Error processing {raindrop_title}: {e}")
+        return False
+
+def finalize_item(r_id, audio_path: Optional[Path], history_lock: threading.Lock):
+    """
+    Tag the bookmark as summarized, persist it to history and delete the audio file.
+    History is only written once the Raindrop update succeeded, so a failed update
+    is retried on the next run.
+    """
+    try:
+        if get_raindrop_client().update_bookmark(r_id, tags=["summarized"], append_tags=True):
+            with history_lock:
+                append_history(r_id)
+        else:
+            logger.warning(f"Not recording {r_id} in history; it will be retried next run.")
+    except Exception as e:
+        logger.error(f"Failed to finalize {r_id}: {e}")
+    finally:
+        # Cleanup
+        if audio_path and audio_path.exists():
+            os.remove(audio_path)
+            logger.info(f"Deleted audio file: {audio_path.name}")
 
 if __name__ == "__main__":
     main()
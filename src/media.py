@@ -1,87 +1,210 @@
 import os
+import re
+import functools
 import json
+import shutil
+import subprocess
+import threading
+import cv2
+import numpy as np
 import yt_dlp
 from pathlib import Path
 from typing import Optional, Tuple
 from loguru import logger
 from .config import settings
 
+# pts_time of each frame reported by ffmpeg's showinfo filter
+_SHOWINFO_PTS = re.compile(r"Parsed_showinfo.*?pts_time:\s*([\d.]+)")
+# Hosts yt-dlp is known to handle; these skip the network probe in verify_url
+_KNOWN_VIDEO_URL = re.compile(
+    r"^https?://(?:[\w-]+\.)*(?:youtube\.com|youtu\.be|tiktok\.com|instagram\.com|facebook\.com|fb\.watch"
+    r"|x\.com|twitter\.com|vimeo\.com|dailymotion\.com|twitch\.tv)(?:[/:?#]|$)",
+    re.IGNORECASE,
+)
+
+# Optional SIMD JPEG encoder (libjpeg-turbo); cv2.imwrite is used when unavailable
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _TURBOJPEG = TurboJPEG()
+except Exception:  # package not installed or libturbojpeg not found
+    _TURBOJPEG = None
+
+# Subtitle lines that carry no text: cue numbers, WEBVTT header, timing lines
+_SUBTITLE_SKIP = re.compile(r"^(?:\d+|WEBVTT.*|.*-->.*)$")
+
+@functools.lru_cache(maxsize=1)
+def _site_extractors() -> tuple:
+    # yt-dlp's site extractors, minus the catch-all generic one
+    from yt_dlp.extractor import gen_extractor_classes
+    return tuple(ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic')
+
 class VideoProcessor:
     def __init__(self, output_dir: Path = settings.DATA_DIR):
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Long-lived YoutubeDL instances, one per option profile and per worker thread,
+        # so extractors, cookie jar and HTTP session are set up once instead of every call.
+        self._ydl_local = threading.local()
+        self._ydl_profiles = {
+            'verify': {
+                'simulate': True,
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': True, # Fast check
+            },
+            'audio': {
+                'format': 'bestaudio/best',
+                'outtmpl': str(self.output_dir / "%(id)s.%(ext)s"),
+                'postprocessors': [{
+                    'key': 'FFmpegExtractAudio',
+                    'preferredcodec': 'mp3',
+                    'preferredquality': '192',
+                }],
+                'writesubtitles': True,
+                'writeautomaticsub': True,
+                'subtitleslangs': ['en', 'zh-Hant', 'zh-Hans', 'zh'], # Prioritize Chinese, then English
+                'quiet': True,
+                'no_warnings': True,
+            },
+            # Metadata only, used to decide between the audio and Director Mode downloads
+            'probe': {
+                'quiet': True,
+                'no_warnings': True,
+            },
+            # Ensure we get mp4 for opencv compatibility
+            # Force H.264 (avc1) to avoid AV1 issues on some platforms (like ARM64 docker)
+            'video': {
+                'format': 'bestvideo[ext=mp4][vcodec^=avc1]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+                'outtmpl': str(self.output_dir / "temp_director_%(id)s.%(ext)s"),
+                'quiet': True,
+                'overwrites': True,
+            },
+        }
+        # Director Mode: the 'video' download plus subtitles, which keep the plain
+        # %(id)s naming so _find_and_parse_subs finds them.
+        self._ydl_profiles['director'] = {
+            **self._ydl_profiles['video'],
+            'outtmpl': {
+                'default': self._ydl_profiles['video']['outtmpl'],
+                'subtitle': self._ydl_profiles['audio']['outtmpl'],
+            },
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': self._ydl_profiles['audio']['subtitleslangs'],
+            'no_warnings': True,
+        }
+
+    def _ydl(self, profile: str) -> yt_dlp.YoutubeDL:
+        """
+        Return this thread's YoutubeDL for the given option profile, creating it on first use.
+        Instances are not thread-safe, so each pool worker keeps its own.
+        """
+        ydl = getattr(self._ydl_local, profile, None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self._ydl_profiles[profile])
+            setattr(self._ydl_local, profile, ydl)
+        return ydl
+
+    def video_key(self, url: str) -> str:
+        """
+        The id yt-dlp will most likely name this URL's files after, worked out from the
+        URL alone (youtube.com/watch?v=X and youtu.be/X both give X). Falls back to the URL.
+        Downloads, frames and temp files are keyed by this id, so two bookmarks with the
+        same key must not be processed at the same time.
+        """
+        for ie in _site_extractors():
+            if ie.suitable(url):
+                return ie.get_temp_id(url) or url
+        return url
 
     def verify_url(self, url: str) -> bool:
         """
         Check if the URL is supported by yt-dlp and is a video.
+        Known video hosts are accepted from the URL alone; others are probed with yt-dlp.
         """
-        ydl_opts = {
-            'simulate': True,
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True, # Fast check
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            try:
-                info = ydl.extract_info(url, download=False)
-                # If it's a playlist, info might be valid but have entries.
-                # Use basic check: if info exists, it's widely supported.
-                return True
-            except Exception as e:
-                logger.warning(f"Verification failed for {url}: {e}")
-                return False
+        if url and _KNOWN_VIDEO_URL.match(url):
+            return True
 
-    def process(self, url: str) -> Tuple[Optional[str], Optional[Path], dict]:
+        try:
+            info = self._ydl('verify').extract_info(url, download=False)
+            # If it's a playlist, info might be valid but have entries.
+            # Use basic check: if info exists, it's widely supported.
+            return True
+        except Exception as e:
+            logger.warning(f"Verification failed for {url}: {e}")
+            return False
+
+    # Director Mode only runs on videos shorter than this (seconds)
+    DIRECTOR_MAX_DURATION = 600
+
+    def process_with_video(self, url: str) -> Tuple[Optional[str], Optional[Path], dict, Optional[Path]]:
         """
-        Returns (transcript_text, audio_file_path, metadata).
-        metadata includes 'duration', 'uploader', 'title'.
+        Download audio + subtitles. For videos eligible for Director Mode the video is
+        downloaded once and the audio is extracted from it locally, instead of downloading
+        the audio and then the video again.
+        Returns (transcript_text, audio_file_path, metadata, video_path); video_path is None
+        when only the audio was downloaded. metadata includes 'duration', 'uploader', 'title'.
         """
-        # Create a unique ID or use hash? 
-        # For simplicity, let yt-dlp handle naming, but we need to find it back.
-        # We'll use a specific template.
-        file_id = f"%(id)s"
-        out_tmpl = str(self.output_dir / f"{file_id}.%(ext)s")
-        
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': out_tmpl,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['en', 'zh-Hant', 'zh-Hans', 'zh'], # Prioritize Chinese, then English
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        meta = {}
+        try:
+            info = self._ydl('probe').extract_info(url, download=False)
+        except Exception as e:
+            logger.error(f"Download failed for {url}: {e}")
+            return None, None, {}, None
+
+        meta = self._meta_from_info(info)
+        video_id = meta['id']
+        duration = meta['duration'] or 0
+
+        if video_id and 0 < duration < self.DIRECTOR_MAX_DURATION and shutil.which("ffmpeg"):
+            try:
+                # Reuse the probed info: no second extraction round-trip
+                self._ydl('director').process_ie_result(info, download=True)
+                video_path = next(self.output_dir.glob(f"temp_director_{video_id}.*"), None)
+                if video_path:
+                    transcript = self._find_and_parse_subs(video_id)
+                    # Audio is only needed when there are no subtitles to summarize
+                    audio_path = None if transcript else self._extract_audio(video_path, video_id)
+                    return transcript, audio_path, meta, video_path
+            except Exception as e:
+                logger.warning(f"Video download failed for {url}, falling back to audio: {e}")
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                video_id = info.get('id')
-                
-                # Extract Metadata
-                meta['id'] = video_id
-                meta['duration'] = info.get('duration', 0)
-                meta['uploader'] = info.get('uploader') or info.get('channel') or "Unknown"
-                meta['title'] = info.get('title')
-                
-                # Check for subtitles file
-                transcript = self._find_and_parse_subs(video_id)
-                
-                audio_path = self.output_dir / f"{video_id}.mp3"
-                if not audio_path.exists():
-                    audio_path = None
-                
-                return transcript, audio_path, meta
-                
+            self._ydl('audio').process_ie_result(info, download=True)
         except Exception as e:
             logger.error(f"Download failed for {url}: {e}")
-            return None, None, {}
+            return None, None, {}, None
+
+        transcript = self._find_and_parse_subs(video_id)
+        audio_path = self.output_dir / f"{video_id}.mp3"
+        if not audio_path.exists():
+            audio_path = None
+        return transcript, audio_path, meta, None
+
+    def _meta_from_info(self, info: dict) -> dict:
+        return {
+            'id': info.get('id'),
+            'duration': info.get('duration', 0),
+            'uploader': info.get('uploader') or info.get('channel') or "Unknown",
+            'title': info.get('title'),
+        }
+
+    def _extract_audio(self, video_path: Path, video_id: str) -> Optional[Path]:
+        """
+        Demux/transcode the audio track of a downloaded video to {video_id}.mp3 with ffmpeg.
+        """
+        audio_path = self.output_dir / f"{video_id}.mp3"
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostdin", "-y",
+            "-i", str(video_path),
+            "-vn", "-acodec", "libmp3lame", "-b:a", "192k",
+            str(audio_path),
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+            return audio_path
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"Audio extraction failed for {video_path.name}: {e}")
+            return None
 
     def _find_and_parse_subs(self, video_id: str) -> Optional[str]:
         """
@@ -109,24 +232,8 @@ class VideoProcessor:
         """
         Simple parser to extract text from VTT/SRT, removing timestamps.
         """
-        content = []
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            seen_lines = set()
-            for line in lines:
-                line = line.strip()
-                if not line: continue
-                if '-->' in line: continue 
-                if line.isdigit(): continue
-                if line.startswith('WEBVTT'): continue
-                
-                if line not in seen_lines:
-                    content.append(line)
-                    seen_lines.add(line)
-            
-            return "\n".join(content)
+            return _parse_subtitle_file(str(path), path.stat().st_mtime_ns)
         except Exception as e:
             logger.error(f"Error parsing subtitle {path}: {e}")
             return None
@@ -143,94 +250,94 @@ class VideoProcessor:
                 path = self.output_dir / f"{video_id}.{lang}.{ext}"
                 if path.exists():
                     try:
-                        return path.read_text(encoding='utf-8')
+                        return _read_subtitle_file(str(path), path.stat().st_mtime_ns)
                     except Exception as e:
                         logger.error(f"Error reading {path}: {e}")
         return ""
 
-    def download_video_temp(self, url: str) -> Optional[Path]:
+    def download_video_temp(self, url: str, video_id: Optional[str] = None) -> Optional[Path]:
         """
         Download video for frame extraction (temp usage).
         Returns path to .mp4 file.
+        The file name includes the video id so concurrent items don't overwrite each other.
         """
-        out_tmpl = str(self.output_dir / "temp_director_video.%(ext)s")
-        # Ensure we get mp4 for opencv compatibility
-        # Force H.264 (avc1) to avoid AV1 issues on some platforms (like ARM64 docker)
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4][vcodec^=avc1]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'outtmpl': out_tmpl,
-            'quiet': True,
-            'overwrites': True,
-        }
         # Prevent stale file usage: explicitly delete temp file if it exists
-        temp_file = self.output_dir / "temp_director_video.mp4"
-        if temp_file.exists():
-            try:
-                os.remove(temp_file)
-                logger.info("Removed stale temp video file.")
-            except OSError:
-                pass
+        if video_id:
+            stale = self.output_dir / f"temp_director_{video_id}.mp4"
+            if stale.exists():
+                try:
+                    os.remove(stale)
+                    logger.info("Removed stale temp video file.")
+                except OSError:
+                    pass
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-                # Find the file (yt-dlp might change extension slightly?)
-                # We forced mp4/mkv, but let's check.
-                # Usually it will be temp_director_video.mp4
-                p = self.output_dir / "temp_director_video.mp4"
-                if p.exists(): return p
-                # Fallback check
-                for f in self.output_dir.glob("temp_director_video.*"):
-                    return f
-                return None
+            info = self._ydl('video').extract_info(url, download=True)
+            stem = f"temp_director_{info.get('id') or video_id}"
+            temp_file = self.output_dir / f"{stem}.mp4"
+            # Find the file (yt-dlp might change extension slightly?)
+            # We forced mp4/mkv, but let's check.
+            # Usually it will be {stem}.mp4
+            if temp_file.exists(): return temp_file
+            # Fallback check
+            for f in self.output_dir.glob(f"{stem}.*"):
+                return f
+            return None
         except Exception as e:
             logger.error(f"Temp video download failed: {e}")
             return None
 
+    # Multi-frame sampling: check t, t+1, t+1.5
+    FRAME_OFFSETS = [0, 1.0, 1.5]
+    # How close (seconds) a decoded frame must be to a sample time in the ffmpeg pass
+    FRAME_TOLERANCE = 0.1
+    # Seek this far (seconds) before the first sample time, so it isn't cut off by the seek
+    FRAME_SEEK_MARGIN = 1.0
+
     def capture_best_frames(self, video_path: Path, timestamps: list, output_dir: Path) -> list:
         """
         Capture frames at specific timestamps.
-        Implements Multi-frame sampling (t, t+1, t+2) to find best image.
+        Implements Multi-frame sampling (t, t+1, t+1.5) to find best image.
+        Candidate frames are decoded in a single ffmpeg pass when ffmpeg is available,
+        otherwise by seeking with OpenCV.
         """
-        import cv2
-        import numpy as np
-        
-        if not cv2 or not video_path.exists():
+        if not video_path.exists():
             return []
-            
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            logger.error("Failed to open video for capture.")
+
+        # Process cues in time order so decoding only ever moves forward
+        timestamps = sorted(timestamps, key=lambda x: x.get('timestamp', 0))
+        sample_times = [
+            [item.get('timestamp', 0) + offset for offset in self.FRAME_OFFSETS]
+            for item in timestamps
+        ]
+        
+        candidates = None
+        if shutil.which("ffmpeg"):
+            candidates = self._extract_frames_ffmpeg(video_path, sample_times)
+        if candidates is None:
+            candidates = self._extract_frames_cv2(video_path, sample_times)
+        if candidates is None:
             return []
             
         saved_frames = []
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        for item in timestamps:
-            target_time = item.get('timestamp', 0)
+        for item, cue_candidates in zip(timestamps, candidates):
             reason = item.get('reason', 'key_moment')
             
             best_score = -1
             best_frame = None
-            best_time = target_time
-            
-            # Multi-frame sampling: check t, t+1, t+1.5
-            offsets = [0, 1.0, 1.5] 
+            best_jpeg = None
+            best_time = item.get('timestamp', 0)
             
-            for offset in offsets:
-                check_time = target_time + offset
-                cap.set(cv2.CAP_PROP_POS_MSEC, check_time * 1000)
-                ret, frame = cap.read()
-                if not ret: continue
-                
-                # Calculate Information Density (Edge Detection)
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                edges = cv2.Canny(gray, 100, 200)
-                score = np.mean(edges)
+            for check_time, frame, jpeg in cue_candidates:
+                # Calculate Information Density (variance of Laplacian on a downscaled copy)
+                score = self._frame_score(frame)
                 
                 if score > best_score:
                     best_score = score
                     best_frame = frame
+                    best_jpeg = jpeg
                     best_time = check_time
             
             if best_frame is not None:
@@ -238,9 +345,167 @@ class VideoProcessor:
                 safe_reason = "".join([c for c in reason if c.isalnum()])[:20]
                 frame_name = f"{int(best_time)}_{safe_reason}.jpg"
                 out_path = output_dir / frame_name
-                cv2.imwrite(str(out_path), best_frame)
+                self._write_jpeg(out_path, best_frame, best_jpeg)
                 saved_frames.append(str(out_path))
                 logger.info(f"Captured frame at {best_time}s: {reason}")
                 
-        cap.release()
         return saved_frames
+
+    # Matches cv2.imwrite's default so output quality doesn't depend on the encoder
+    JPEG_QUALITY = 95
+
+    def _write_jpeg(self, out_path: Path, frame, jpeg: Optional[bytes] = None):
+        """
+        Save a frame as JPEG. Frames from the ffmpeg pass are already JPEG-encoded and are
+        written as-is; otherwise encode with libjpeg-turbo if available, else cv2.imwrite.
+        """
+        if jpeg is not None:
+            out_path.write_bytes(jpeg)
+        elif _TURBOJPEG is not None:
+            out_path.write_bytes(_TURBOJPEG.encode(frame, quality=self.JPEG_QUALITY, pixel_format=TJPF_BGR))
+        else:
+            cv2.imwrite(str(out_path), frame, [cv2.IMWRITE_JPEG_QUALITY, self.JPEG_QUALITY])
+
+    SCORE_WIDTH = 320
+
+    def _frame_score(self, frame) -> float:
+        """
+        Sharpness / detail score: variance of the Laplacian on a 320px-wide grayscale copy.
+        Text, charts and slides score high; blurry or flat frames score low.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape
+        if w > self.SCORE_WIDTH:
+            gray = cv2.resize(gray, (self.SCORE_WIDTH, max(1, self.SCORE_WIDTH * h // w)), interpolation=cv2.INTER_AREA)
+        return float(cv2.Laplacian(gray, cv2.CV_16S, ksize=3).var())
+
+    def _extract_frames_ffmpeg(self, video_path: Path, sample_times: list) -> Optional[list]:
+        """
+        Decode every sample time in one linear ffmpeg pass (no per-frame seeks).
+        Returns, per cue, a list of (time, BGR frame, JPEG bytes) for the samples that
+        were found, or None if ffmpeg failed.
+        """
+        flat_times = sorted({t for times in sample_times for t in times})
+        if not flat_times:
+            return [[] for _ in sample_times]
+            
+        # Only decode the span that holds samples: seek to just before the first one and stop
+        # after the last. After an input-side -ss, timestamps restart at 0, so the select
+        # expression and the showinfo times are shifted by `start`.
+        start = max(0.0, flat_times[0] - self.FRAME_SEEK_MARGIN)
+        end = flat_times[-1] + self.FRAME_TOLERANCE
+        select_expr = "+".join(f"lt(abs(t-{t - start:.3f}),{self.FRAME_TOLERANCE})" for t in flat_times)
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostdin",
+            "-ss", f"{start:.3f}",
+            "-t", f"{end - start:.3f}",
+            "-i", str(video_path),
+            # showinfo logs each emitted frame's pts_time to stderr, so frames map back to sample times
+            "-vf", f"select='{select_expr}',showinfo",
+            "-vsync", "0",
+            "-q:v", "2",
+            "-f", "image2pipe", "-vcodec", "mjpeg", "pipe:1",
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"ffmpeg frame extraction failed, falling back to OpenCV: {e}")
+            return None
+            
+        frame_times = [start + float(t) for t in _SHOWINFO_PTS.findall(result.stderr.decode("utf-8", "replace"))]
+        jpegs = _split_jpegs(result.stdout)
+        if len(frame_times) != len(jpegs):
+            logger.warning(f"ffmpeg returned {len(jpegs)} frames but {len(frame_times)} timestamps. Falling back to OpenCV.")
+            return None
+            
+        candidates = []
+        for times in sample_times:
+            cue_candidates = []
+            for check_time in times:
+                # Closest decoded frame to this sample time
+                nearest = min(range(len(frame_times)), key=lambda i: abs(frame_times[i] - check_time), default=None)
+                if nearest is None or abs(frame_times[nearest] - check_time) > self.FRAME_TOLERANCE:
+                    continue
+                frame = cv2.imdecode(np.frombuffer(jpegs[nearest], dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None:
+                    cue_candidates.append((check_time, frame, jpegs[nearest]))
+            candidates.append(cue_candidates)
+        return candidates
+
+    # Gaps (seconds) shorter than this are walked with grab() instead of a seek
+    MAX_GRAB_GAP = 5.0
+
+    def _extract_frames_cv2(self, video_path: Path, sample_times: list) -> Optional[list]:
+        """
+        Fallback: walk the sample times in ascending order with OpenCV.
+        Short gaps are skipped with grab() (no colour conversion, no index lookup);
+        only long gaps fall back to a seek, so the decoder never goes backwards.
+        Returns, per cue, a list of (time, BGR frame, None), or None if the video can't be opened.
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            logger.error("Failed to open video for capture.")
+            return None
+
+        decoded = {}
+        pos = 0.0
+        for check_time in sorted({t for times in sample_times for t in times}):
+            if check_time - pos > self.MAX_GRAB_GAP:
+                cap.set(cv2.CAP_PROP_POS_MSEC, check_time * 1000)
+            ret = cap.grab()
+            while ret and cap.get(cv2.CAP_PROP_POS_MSEC) < check_time * 1000:
+                ret = cap.grab()
+            if not ret:
+                break  # End of video: later times can't be reached either
+            pos = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            ret, frame = cap.retrieve()
+            if ret:
+                decoded[check_time] = frame
+
+        cap.release()
+        return [
+            [(t, decoded[t], None) for t in times if t in decoded]
+            for times in sample_times
+        ]
+
+
+# Subtitle files are read by both _parse_vtt_or_srt and get_transcript_with_timestamps;
+# cache keyed by (path, mtime_ns) so a re-downloaded file is picked up again.
+@functools.lru_cache(maxsize=64)
+def _read_subtitle_file(path_str: str, mtime_ns: int) -> str:
+    return Path(path_str).read_text(encoding='utf-8')
+
+@functools.lru_cache(maxsize=64)
+def _parse_subtitle_file(path_str: str, mtime_ns: int) -> str:
+    content = []
+    # Auto-captions repeat each line in the following cue, so only
+    # consecutive duplicates (once timing lines are skipped) need dropping.
+    prev = None
+    # Decode the whole file once (shared with _read_subtitle_file) instead of per line
+    for line in _read_subtitle_file(path_str, mtime_ns).splitlines():
+        line = line.strip()
+        if not line or _SUBTITLE_SKIP.match(line):
+            continue
+        if line != prev:
+            content.append(line)
+            prev = line
+
+    return "\n".join(content)
+
+
+def _split_jpegs(data: bytes) -> list:
+    """
+    Split an MJPEG image2pipe stream into individual JPEG buffers (SOI ... EOI).
+    """
+    frames = []
+    start = 0
+    while True:
+        soi = data.find(b"\xff\xd8", start)
+        if soi < 0:
+            break
+        eoi = data.find(b"\xff\xd9", soi + 2)
+        if eoi < 0:
+            break
+        frames.append(data[soi:eoi + 2])
+        start = eoi + 2
+    return frames
@@ -1,11 +1,16 @@
-import time
-from typing import List, Dict, Any
+import asyncio
+import re
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode
 from loguru import logger
 from .config import settings
 from .raindrop import RaindropClient
-from .llm import LLMProvider
+from .llm import LLMProvider, format_collections
 
 class RaindropOrganizer:
+    # Concurrent Raindrop bulk-move requests (one per target collection)
+    MOVE_CONCURRENCY = 8
+
     def __init__(self, raindrop_client: RaindropClient, llm: LLMProvider):
         self.raindrop = raindrop_client
         self.llm = llm
@@ -34,42 +39,129 @@ class RaindropOrganizer:
 
         logger.info(f"Found {len(unsorted_items)} items to organize.")
         
-        # 3. Process each item
-        for item in unsorted_items:
-            try:
-                self._process_item(item, collections)
-                # Respect API limits/LLM limits
-                time.sleep(1) 
-            except Exception as e:
-                logger.error(f"Error processing item {item.get('title', 'Unknown')}: {e}")
-
-    def _process_item(self, item: Dict[str, Any], collections: Dict[int, str]):
-        r_id = item['_id']
+        # 3. Classify all items up front (cached decisions first, then batched LLM requests)
+        targets = self._classify_items(unsorted_items, collections)
+        
+        # 4. Group items by target collection, then move each group with one bulk request
+        groups: Dict[int, List[int]] = {}
+        for item, target_cid in zip(unsorted_items, targets):
+            target_cid = self._process_item(item, target_cid, collections)
+            if target_cid is not None:
+                groups.setdefault(target_cid, []).append(item['_id'])
+
+        if groups:
+            asyncio.run(self._move_groups(groups, collections))
+
+    async def _move_groups(self, groups: Dict[int, List[int]], collections: Dict[int, str]):
+        # Bounded in flight, and rate-limited to stay inside Raindrop's quota
+        semaphore = asyncio.BoundedSemaphore(self.MOVE_CONCURRENCY)
+
+        async def bounded(target_cid: int, ids: List[int]):
+            target_name = collections[target_cid]
+            async with semaphore:
+                if settings.DRY_RUN:
+                    logger.success(f"  [DRY RUN] Would move {len(ids)} item(s) to: {target_name} ({target_cid})")
+                    return
+                async with self.raindrop.rate_limiter:
+                    success = await asyncio.to_thread(self.raindrop.move_bookmarks_bulk, ids, target_cid)
+                if success:
+                    logger.success(f"  -> Moved {len(ids)} item(s) to: {target_name}")
+                else:
+                    logger.error(f"  -> Failed to move {len(ids)} item(s) to: {target_name}")
+
+        await asyncio.gather(*(bounded(target_cid, ids) for target_cid, ids in groups.items()))
+
+    def _classify_items(self, items: List[Dict[str, Any]], collections: Dict[int, str]) -> List[Optional[int]]:
+        """
+        Returns one target collection ID (or None) per item, in input order.
+        Bookmarks pointing at the same URL are classified once and share the result.
+        """
+        clusters: Dict[str, List[int]] = {}
+        for i, item in enumerate(items):
+            clusters.setdefault(self._canonical_url(item) or f"id:{item.get('_id', i)}", []).append(i)
+        if len(clusters) < len(items):
+            logger.info(f"{len(items) - len(clusters)} duplicate URL(s) will share a classification.")
+
+        representatives = [items[members[0]] for members in clusters.values()]
+        rep_targets = self._classify_unique(representatives, collections)
+
+        targets: List[Optional[int]] = [None] * len(items)
+        for members, cid in zip(clusters.values(), rep_targets):
+            for i in members:
+                targets[i] = cid
+        return targets
+
+    @staticmethod
+    def _canonical_url(item: Dict[str, Any]) -> str:
+        """
+        Normalized link for duplicate detection: case-insensitive host without "www.",
+        no trailing slash, fragment or utm_* tracking params. Other query params are kept
+        (they often identify the content, e.g. YouTube's ?v=).
+        """
+        link = item.get('link') or ''
+        if not link:
+            return ''
+        p = urlparse(link)
+        netloc = p.netloc.lower().removeprefix('www.')
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+                                 if not k.lower().startswith('utm_')))
+        return f"{p.scheme.lower()}://{netloc}{p.path.rstrip('/')}?{query}"
+
+    def _classify_unique(self, items: List[Dict[str, Any]], collections: Dict[int, str]) -> List[Optional[int]]:
+        """
+        Returns one target collection ID (or None) per item, in input order.
+        Bookmarks seen before (same domain and title) reuse the provider's cached decision,
+        so a changed excerpt doesn't trigger another LLM call.
+        """
+        # Larger runs can go through the provider's batch API when BATCH_MODE is on
+        use_batch_api = settings.BATCH_MODE and self.llm.supports_batch and len(items) > 5
+        logger.info(f"Classifying {len(items)} items{' via batch API' if use_batch_api else ''}...")
+        bookmarks = [(item.get('title', ''), self._get_note(item)) for item in items]
+        cache_keys = [self._cache_key(item) for item in items]
+        # Collections are fixed for the run: render them for the prompts once
+        collections_block = format_collections(collections)
+        if use_batch_api:
+            return self.llm.classify_bookmarks_batch(bookmarks, collections, use_batch_api=True,
+                                                     collections_block=collections_block,
+                                                     cache_keys=cache_keys)
+        return asyncio.run(self.llm.classify_many(bookmarks, collections, collections_block,
+                                                  cache_keys=cache_keys))
+
+    @classmethod
+    def _cache_key(cls, item: Dict[str, Any]) -> str:
+        """
+        (domain, title) identity, so a re-saved page reuses its earlier decision.
+        Empty or generic titles ("Untitled", or just the site name like "YouTube") say
+        nothing about the page, so those bookmarks are keyed by their canonical URL instead.
+        """
+        domain = urlparse(item.get('link', '')).netloc.lower()
+        title = (item.get('title') or '').lower().strip()
+        compact = re.sub(r'\W', '', title)
+        if not compact or compact == 'untitled' or compact in domain.replace('.', ''):
+            return f"url:{cls._canonical_url(item) or item.get('_id')}"
+        return f"site:{domain}|{title}"
+
+    @staticmethod
+    def _get_note(item: Dict[str, Any]) -> str:
+        return item.get('excerpt', '') or item.get('note', '') or ''
+
+    def _process_item(self, item: Dict[str, Any], target_cid: Optional[int], collections: Dict[int, str]) -> Optional[int]:
+        """
+        Validate the classification for one item.
+        Returns the collection to move it to, or None to leave it in Unsorted.
+        """
         title = item.get('title', '')
-        note = item.get('excerpt', '') or item.get('note', '') or ''
         link = item.get('link', '')
 
         logger.info(f"Analyzing: {title} ({link})")
         
-        # Ask LLM for best collection
-        target_cid = self.llm.classify_bookmark(title=title, note=note, collections=collections)
-        
         if target_cid is None:
             logger.warning(f"  -> No suitable collection found (or uncertain). Skipping.")
-            return
+            return None
 
         if target_cid not in collections:
             logger.warning(f"  -> LLM returned unknown collection ID {target_cid}. Skipping.")
-            return
-            
-        target_name = collections[target_cid]
-        
-        # Execute Move
-        if settings.DRY_RUN:
-            logger.success(f"  [DRY RUN] Would move to: {target_name} ({target_cid})")
-        else:
-            success = self.raindrop.move_bookmark(r_id, target_cid)
-            if success:
-                logger.success(f"  -> Moved to: {target_name}")
-            else:
-                logger.error(f"  -> Failed to move to: {target_name}")
+            return None
+
+        logger.info(f"  -> Target: {collections[target_cid]}")
+        return target_cid
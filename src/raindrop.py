@@ -1,11 +1,54 @@
+import re
+import math
+import functools
+import asyncio
+import threading
+import time
+import orjson
 import requests
-from typing import List, Dict, Any
-from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Collection, Dict, List, Optional
 from loguru import logger
 from .config import settings
+from .ratelimit import AsyncRateLimiter
+
+# Sites where every link is a video (subdomains included)
+_VIDEO_DOMAINS = frozenset({
+    "youtube.com", "youtu.be",
+    "vimeo.com",
+    "tiktok.com",
+    "dailymotion.com",
+    "twitch.tv",
+})
+
+# Video-site URLs, matched against the host (and path, for social sites that mix
+# videos with other posts). Anchored so e.g. "notyoutube.com" doesn't count.
+_VIDEO_RE = re.compile(
+    r"^[a-z][a-z0-9+.-]*://(?:[^/?#@]*@)?(?:[\w-]+\.)*(?:"
+    r"(?:" + "|".join(re.escape(d) for d in sorted(_VIDEO_DOMAINS)) + r")(?::\d+)?(?:[/?#]|$)"
+    # Instagram Reels
+    r"|instagram\.com(?::\d+)?/(?:[^?#]*/)?reel/"
+    # Facebook Reels/Watch/Share
+    r"|facebook\.com(?::\d+)?/(?:[^?#]*/)?(?:reel/|watch|videos/|share/v/)"
+    r")",
+    re.IGNORECASE,
+)
+
+# Server-side pre-filter for listings (opt-in, RAINDROP_SERVER_FILTER): Raindrop's own
+# video type, the video sites above, and the social sites whose Reels/Watch paths
+# _VIDEO_RE checks afterwards. Search terms are ANDed by default; match:OR makes any
+# one term enough.
+_VIDEO_SEARCH = " ".join(
+    ["match:OR", "type:video"]
+    + [f"domain:{d}" for d in sorted(_VIDEO_DOMAINS | {"instagram.com", "facebook.com"})]
+)
 
 class RaindropClient:
     BASE_URL = "https://api.raindrop.io/rest/v1"
+    # How long a listed bookmark is trusted for tag appends without re-fetching it
+    SNAPSHOT_TTL = 600
 
     def __init__(self):
         self.headers = {
@@ -13,6 +56,21 @@ class RaindropClient:
             "Content-Type": "application/json",
             "User-Agent": settings.APP_USER_AGENT
         }
+        # One keep-alive session for all calls; transient errors (429/5xx) are retried
+        # with backoff. urllib3 does not retry POSTs by default.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
+        # raindrop_id -> (fetch time, item) for bookmarks listed this run
+        self._snapshots: Dict[int, tuple] = {}
+        self._snapshot_lock = threading.Lock()
+        # Shared by every async caller (page fetches, organizer moves) to stay inside the quota
+        self.rate_limiter = AsyncRateLimiter(settings.RAINDROP_RATE_LIMIT, 60)
 
     def check_connection(self):
         """
@@ -22,7 +80,7 @@ class RaindropClient:
         # This is kept for backward compat if needed, but we will mostly use get_roots.
         try:
             url = f"{self.BASE_URL}/user/stats"
-            requests.get(url, headers=self.headers).raise_for_status()
+            self.session.get(url).raise_for_status()
             return True
         except:
             return False
@@ -33,41 +91,31 @@ class RaindropClient:
         Returns Dict[id, title]
         """
         cols = {}
-        try:
-            # 1. Get Roots
-            url_roots = f"{self.BASE_URL}/collections"
-            resp_roots = requests.get(url_roots, headers=self.headers)
-            resp_roots.raise_for_status()
-            for item in resp_roots.json().get('items', []):
-                cols[item['_id']] = item['title']
-
-            # 2. Get Children (All nested)
-            url_children = f"{self.BASE_URL}/collections/childrens"
-            resp_children = requests.get(url_children, headers=self.headers)
-            resp_children.raise_for_status()
-            for item in resp_children.json().get('items', []):
-                cols[item['_id']] = item['title']
-                
-            return cols
-        except Exception as e:
-            logger.error(f"Failed to fetch collections: {e}")
-            return {}
+        # Roots and children (all nested) are independent, so fetch both at once
+        urls = {
+            "roots": f"{self.BASE_URL}/collections",
+            "children": f"{self.BASE_URL}/collections/childrens",
+        }
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {kind: executor.submit(self.session.get, url) for kind, url in urls.items()}
+
+        for kind, future in futures.items():
+            try:
+                response = future.result()
+                response.raise_for_status()
+                for item in orjson.loads(response.content).get('items', []):
+                    cols[item['_id']] = item['title']
+            except Exception as e:
+                logger.error(f"Failed to fetch {kind} collections: {e}")
+
+        return cols
 
     def get_candidate_bookmarks(self, collection_id: int, page: int = 0, per_page: int = 50) -> List[Dict[str, Any]]:
         """
         Fetch bookmarks from a SPECIFIC collection.
         """
-        url = f"{self.BASE_URL}/raindrops/{collection_id}"
-        params = {
-            "page": page,
-            "perpage": per_page,
-            "sort": "-created"
-        }
-        
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_page(collection_id, page, per_page)
             items = data.get("items", [])
             
             candidates = []
@@ -81,6 +129,87 @@ class RaindropClient:
             logger.error(f"Error fetching raindrops for col {collection_id}: {e}")
             return []
 
+    async def get_all_candidates(self, collection_id: int, per_page: int = 50,
+                                 max_concurrency: int = 4, exclude: Collection[int] = (),
+                                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch video candidates (minus ids in `exclude`) from the pages of a collection.
+        The first page tells us the total count; further pages are fetched max_concurrency
+        at a time, until `limit` candidates are found or the pages run out (limit=None: all).
+        Every request goes through the rate limiter. Order is preserved (newest first).
+        """
+        async def fetch(page: int) -> Dict[str, Any]:
+            async with self.rate_limiter:
+                return await asyncio.to_thread(self._get_page, collection_id, page, per_page)
+
+        def keep(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return [item for item in data.get("items", [])
+                    if item["_id"] not in exclude and self._is_video_candidate(item)]
+
+        try:
+            first = await fetch(0)
+        except Exception as e:
+            logger.error(f"Error fetching raindrops for col {collection_id}: {e}")
+            return []
+
+        candidates = keep(first)
+        pages = math.ceil(first.get("count", 0) / per_page)
+        for start in range(1, pages, max_concurrency):
+            if limit is not None and len(candidates) >= limit:
+                break
+            wave = range(start, min(start + max_concurrency, pages))
+            results = await asyncio.gather(*(fetch(page) for page in wave), return_exceptions=True)
+            for page, data in zip(wave, results):
+                if isinstance(data, Exception):
+                    logger.error(f"Error fetching page {page} of col {collection_id}: {data}")
+                else:
+                    candidates.extend(keep(data))
+        return candidates
+
+    def _get_page(self, collection_id: int, page: int, per_page: int) -> Dict[str, Any]:
+        """
+        Raw JSON of one page of a collection (newest first). Raises on HTTP errors.
+        With RAINDROP_SERVER_FILTER, only likely videos are returned (and counted).
+        """
+        url = f"{self.BASE_URL}/raindrops/{collection_id}"
+        params = {
+            "page": page,
+            "perpage": per_page,
+            "sort": "-created"
+        }
+        if settings.RAINDROP_SERVER_FILTER:
+            params["search"] = _VIDEO_SEARCH
+        response = self.session.get(url, params=params)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        self._remember(data.get("items", []))
+        return data
+
+    def _remember(self, items: List[Dict[str, Any]]):
+        now = time.monotonic()
+        with self._snapshot_lock:
+            for item in items:
+                self._snapshots[item["_id"]] = (now, item)
+
+    def _get_bookmark(self, raindrop_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Latest known state of a bookmark: the listing snapshot if fresh, else one GET.
+        """
+        with self._snapshot_lock:
+            entry = self._snapshots.get(raindrop_id)
+        if entry and time.monotonic() - entry[0] < self.SNAPSHOT_TTL:
+            return entry[1]
+        try:
+            response = self.session.get(f"{self.BASE_URL}/raindrop/{raindrop_id}")
+            response.raise_for_status()
+            item = orjson.loads(response.content).get("item")
+            if item:
+                self._remember([item])
+            return item
+        except Exception as e:
+            logger.error(f"Failed to fetch bookmark {raindrop_id}: {e}")
+            return None
+
     def _is_video_candidate(self, item: Dict[str, Any]) -> bool:
         """
         Determine if a bookmark is a likely video candidate.
@@ -92,55 +221,46 @@ class RaindropClient:
         if item.get("type") == "video":
             return True
         
-        # Rule 2: URL heuritstics
-        url = item.get("link", "")
-        domain = urlparse(url).netloc.lower()
-        path = urlparse(url).path.lower()
-        
-        video_domains = [
-            "youtube.com", "youtu.be",
-            "vimeo.com",
-            "tiktok.com",
-            "dailymotion.com",
-            "twitch.tv"
-        ]
-        
-        if any(d in domain for d in video_domains):
-            return True
-            
-        # Specific checks for social media video types that might be saved as 'link'
-        # Instagram Reels
-        if "instagram.com" in domain and "/reel/" in path:
-            return True
-            
-        # Facebook Reels/Watch/Share
-        if "facebook.com" in domain and ("/reel/" in path or "/watch" in path or "/videos/" in path or "/share/v/" in path):
-            return True
-            
+        # Rule 2: URL heuristics (known video sites, plus Reels/Watch links saved as 'link')
         # X/Twitter Video (often just a tweet status, harder to detect without scraping, but let's be conservative)
-        
-        return False
+        return bool(_VIDEO_RE.match(item.get("link") or ""))
 
-    def update_bookmark(self, raindrop_id: int, note: str = None, tags: List[str] = None):
+    def update_bookmark(self, raindrop_id: int, note: str = None, tags: List[str] = None,
+                        append_tags: bool = False) -> bool:
         """
         Update the bookmark with summary in note or add tags.
+        With append_tags, `tags` are added to the bookmark's existing tags instead of replacing them.
+        Returns True if the update was applied (or there was nothing to update).
         """
         url = f"{self.BASE_URL}/raindrop/{raindrop_id}"
         payload = {}
         if note:
             payload["please_parse"] = {} # Sometimes needed? No, just 'note'
             payload["note"] = note
+        if tags and append_tags:
+            # Raindrop Update replaces fields, so merge with the current tags first.
+            # Bookmarks listed this run come from the snapshot, without an extra GET.
+            current = self._get_bookmark(raindrop_id)
+            if current is None:
+                logger.error(f"Not updating bookmark {raindrop_id}: current tags unknown.")
+                return False
+            existing = current.get("tags", [])
+            tags = existing + [t for t in tags if t not in existing]
         if tags:
-            payload["tags"] = tags # This replaces tags. Be careful. Appending is safer logic in caller.
-            
-        # Implementation Note: Raindrop Update replaces fields. 
-        # Ideally we fetch first to append tags, but for now we just support overwriting/setting if provided.
-        # If we just want to update note, we send note.
+            payload["tags"] = tags # This replaces tags.
+        if not payload:
+            return True
         
         try:
-            requests.put(url, headers=self.headers, json=payload)
+            response = self.session.put(url, json=payload)
+            response.raise_for_status()
+            item = orjson.loads(response.content).get("item")
+            if item:
+                self._remember([item])
+            return True
         except Exception as e:
             logger.error(f"Failed to update bookmark {raindrop_id}: {e}")
+            return False
 
     def move_bookmark(self, raindrop_id: int, collection_id: int):
         """
@@ -153,11 +273,41 @@ class RaindropClient:
             }
         }
         try:
-            requests.put(url, headers=self.headers, json=payload)
+            self.session.put(url, json=payload)
             logger.info(f"Moved bookmark {raindrop_id} to collection {collection_id}")
             return True
         except Exception as e:
             logger.error(f"Failed to move bookmark {raindrop_id}: {e}")
             return False
 
-raindrop_client = RaindropClient()
+    def move_bookmarks_bulk(self, raindrop_ids: List[int], collection_id: int, source_collection_id: int = -1) -> bool:
+        """
+        Move many bookmarks from one collection to another in a single request.
+        Defaults to moving out of Unsorted (-1).
+        """
+        url = f"{self.BASE_URL}/raindrops/{source_collection_id}"
+        payload = {
+            "ids": raindrop_ids,
+            "collection": {
+                "$id": collection_id
+            }
+        }
+        try:
+            response = self.session.put(url, json=payload)
+            response.raise_for_status()
+            if not orjson.loads(response.content).get("result"):
+                logger.error(f"Bulk move to collection {collection_id} was rejected: {response.text}")
+                return False
+            logger.info(f"Moved {len(raindrop_ids)} bookmarks to collection {collection_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to bulk move {len(raindrop_ids)} bookmarks to {collection_id}: {e}")
+            return False
+
+
+@functools.lru_cache(maxsize=1)
+def get_raindrop_client() -> RaindropClient:
+    """
+    Return the shared RaindropClient, created on first use.
+    """
+    return RaindropClient()
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token-bucket rate limiter for asyncio code: `async with limiter: ...`.
+    Allows bursts of up to `rate` calls, refilling at `rate` per `period` seconds.
+    A rate of 0 (or less) disables limiting.
+    Holds no loop-bound state, so one instance can be shared across asyncio.run() calls.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+        self._updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            # No await between check and decrement, so this is atomic within the event loop
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
@@ -1,5 +1,11 @@
+import dbm
+import hashlib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode
 from loguru import logger
 from datetime import datetime
 from .config import settings
@@ -12,6 +18,20 @@ class ReadwiseClient:
             "Authorization": f"Token {settings.READWISE_TOKEN}",
             "Content-Type": "application/json"
         }
+        # One keep-alive session for all saves. urllib3 only retries idempotent methods by
+        # default; Reader's save is idempotent by URL (a repeat returns the existing
+        # document), so POSTs are allowed to retry on 429/5xx with backoff.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                              allowed_methods=frozenset({"POST"})),
+        )
+        self.session.mount("https://", adapter)
+        # Workers save concurrently; dbm files must not be opened for writing twice at once
+        self._seen_lock = threading.Lock()
 
     def save_summary(self, 
                      url: str, 
@@ -28,6 +48,13 @@ class ReadwiseClient:
             logger.warning("Readwise Token not set. Skipping sync.")
             return False
 
+        # Reader keeps one document per URL, so a page saved by an earlier run or retry
+        # needn't be POSTed again (the regenerated summary_html differs every run)
+        key = self._seen_key(url, title)
+        if self._already_sent(key):
+            logger.info(f"Already saved to Readwise Reader, skipping: {title}")
+            return True
+
         payload = {
             "url": url,
             "title": title,
@@ -41,9 +68,10 @@ class ReadwiseClient:
         # If published_date is needed, it can be added to payload['published_date'] (ISO 8601)
         
         try:
-            response = requests.post(self.API_URL, headers=self.headers, json=payload)
+            response = self.session.post(self.API_URL, json=payload)
             response.raise_for_status()
             logger.info(f"Successfully saved to Readwise Reader: {title}")
+            self._mark_sent(key)
             return True
         except Exception as e:
             logger.error(f"Readwise Sync Failed: {e}")
@@ -52,4 +80,31 @@ class ReadwiseClient:
                 logger.error(f"Readwise Response: {e.response.text}")
             return False
 
+    @staticmethod
+    def _seen_key(url: str, title: str) -> str:
+        """
+        Normalized URL (case-insensitive host without "www.", no trailing slash, fragment
+        or utm_* params); the title only stands in when there is no URL.
+        """
+        p = urlparse(url or '')
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+                                 if not k.lower().startswith('utm_')))
+        ident = f"{p.netloc.lower().removeprefix('www.')}{p.path.rstrip('/')}?{query}" if p.netloc else f"title:{title}"
+        return hashlib.blake2b(ident.encode(), digest_size=16).hexdigest()
+
+    def _already_sent(self, key: str) -> bool:
+        try:
+            with self._seen_lock, dbm.open(str(settings.data_file("readwise_seen")), "c") as seen:
+                return key in seen
+        except Exception as e:
+            logger.warning(f"Readwise dedup cache unavailable: {e}")
+            return False
+
+    def _mark_sent(self, key: str):
+        try:
+            with self._seen_lock, dbm.open(str(settings.data_file("readwise_seen")), "c") as seen:
+                seen[key] = b"1"
+        except Exception as e:
+            logger.warning(f"Failed to update Readwise dedup cache: {e}")
+
 readwise_client = ReadwiseClient()
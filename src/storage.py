@@ -1,21 +1,55 @@
-import boto3
-from botocore.exceptions import ClientError
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from loguru import logger
 from .config import settings
 
+# Content-Type by file suffix; anything else is uploaded as octet-stream
+_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
 class R2Storage:
+    # S3 DeleteObjects accepts at most 1000 keys per call
+    DELETE_BATCH_SIZE = 1000
+    # Concurrent DeleteObjects calls during cleanup
+    DELETE_WORKERS = 8
+    # Concurrent frame PUTs per item; every item worker uploads at once, sharing one client
+    UPLOAD_WORKERS = 8
+
     def __init__(self):
         self.enabled = False
         if all([settings.R2_ACCOUNT_ID, settings.R2_ACCESS_KEY_ID, settings.R2_SECRET_ACCESS_KEY, settings.R2_BUCKET_NAME, settings.R2_PUBLIC_DOMAIN]):
             self.enabled = True
             try:
-                self.s3_client = boto3.client(
+                # boto3 loads a lot of botocore data on import, so only pay for it when R2 is used
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+                from botocore.config import Config
+
+                # One session/client for the process, so credentials and endpoints resolve once
+                self.session = boto3.session.Session()
+                self.s3_client = self.session.client(
                     service_name='s3',
                     endpoint_url=f"https://{settings.R2_ACCOUNT_ID}.r2.cloudflarestorage.com",
                     aws_access_key_id=settings.R2_ACCESS_KEY_ID,
                     aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-                    region_name='auto' 
+                    region_name='auto',
+                    # botocore defaults to 10 pooled connections; size it for all concurrent uploads
+                    config=Config(max_pool_connections=max(
+                        self.UPLOAD_WORKERS * settings.MAX_WORKERS, self.DELETE_WORKERS
+                    )),
+                )
+                # Frames are small single-PUT uploads; larger files go multipart in 5 MiB parts
+                self.transfer_config = TransferConfig(
+                    multipart_threshold=5 * 1024 * 1024,
+                    multipart_chunksize=5 * 1024 * 1024,
+                    max_concurrency=10,
+                    use_threads=True,
                 )
                 logger.info("Cloudflare R2 Storage Initialized.")
             except Exception as e:
@@ -31,22 +65,21 @@ class R2Storage:
         if not self.enabled:
             return None
 
+        from botocore.exceptions import ClientError
+
         if object_name is None:
             object_name = file_path.name
 
         try:
             # Determine Content Type
-            content_type = 'application/octet-stream'
-            if file_path.suffix.lower() in ['.jpg', '.jpeg']:
-                content_type = 'image/jpeg'
-            elif file_path.suffix.lower() == '.png':
-                content_type = 'image/png'
+            content_type = _CONTENT_TYPES.get(file_path.suffix.lower(), 'application/octet-stream')
 
             self.s3_client.upload_file(
                 str(file_path), 
                 settings.R2_BUCKET_NAME, 
                 object_name,
-                ExtraArgs={'ContentType': content_type}
+                ExtraArgs={'ContentType': content_type},
+                Config=self.transfer_config
             )
             
             # Construct Public URL
@@ -78,36 +111,59 @@ class R2Storage:
             cutoff_date = datetime.now(timezone.utc) - timedelta(days=retention_days)
             logger.info(f"Checking for R2 files older than {retention_days} days (before {cutoff_date})...")
 
-            # List objects
+            # List objects (the paginator is sequential by design: each page carries the next cursor).
+            # Full delete batches are dispatched to a pool while listing continues.
             paginator = self.s3_client.get_paginator('list_objects_v2')
             page_iterator = paginator.paginate(Bucket=settings.R2_BUCKET_NAME)
 
-            objects_to_delete = []
-            
-            for page in page_iterator:
-                if 'Contents' not in page:
-                    continue
-                
-                for obj in page['Contents']:
-                    if obj['LastModified'] < cutoff_date:
-                        objects_to_delete.append({'Key': obj['Key']})
-
-            if objects_to_delete:
-                logger.info(f"Found {len(objects_to_delete)} old files to delete.")
-                
-                # Delete in batches of 1000 (S3 limit)
-                for i in range(0, len(objects_to_delete), 1000):
-                    batch = objects_to_delete[i:i+1000]
-                    self.s3_client.delete_objects(
-                        Bucket=settings.R2_BUCKET_NAME,
-                        Delete={'Objects': batch}
-                    )
-                    logger.info(f"Deleted batch of {len(batch)} files.")
+            batch = []
+            futures = []
+            with ThreadPoolExecutor(max_workers=self.DELETE_WORKERS) as executor:
+                for page in page_iterator:
+                    for obj in page.get('Contents', []):
+                        if obj['LastModified'] < cutoff_date:
+                            batch.append({'Key': obj['Key']})
+                            if len(batch) == self.DELETE_BATCH_SIZE:
+                                futures.append(executor.submit(self._delete_batch, batch))
+                                batch = []
+                if batch:
+                    futures.append(executor.submit(self._delete_batch, batch))
+
+            results = [future.result() for future in futures]
+            if results:
+                deleted = sum(ok for ok, _ in results)
+                failed = sum(err for _, err in results)
+                logger.info(f"Deleted {deleted} old files in {len(results)} batch(es).")
+                if failed:
+                    logger.warning(f"{failed} old files could not be deleted.")
             else:
                 logger.info("No old files found to cleanup.")
 
         except Exception as e:
             logger.error(f"R2 Cleanup failed: {e}")
 
-r2_storage = R2Storage()
+    def _delete_batch(self, batch: list) -> tuple:
+        """
+        Delete up to DELETE_BATCH_SIZE objects. Returns (deleted, failed) counts.
+        """
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=settings.R2_BUCKET_NAME,
+                Delete={'Objects': batch}
+            )
+            errors = response.get('Errors', [])
+            for err in errors[:5]:
+                logger.error(f"Failed to delete {err.get('Key')}: {err.get('Message')}")
+            return len(batch) - len(errors), len(errors)
+        except Exception as e:
+            logger.error(f"R2 delete batch of {len(batch)} files failed: {e}")
+            return 0, len(batch)
+
+
+@functools.lru_cache(maxsize=1)
+def get_r2_storage() -> R2Storage:
+    """
+    Return the shared R2Storage, created on first use.
+    """
+    return R2Storage()
 
@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from src.config import settings
+from src.llm import GeminiProvider
+
+
+class ClassifyCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(settings, "data_file", lambda name: Path(tmp.name) / name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.provider = GeminiProvider()
+        self.provider._classify_model = object()
+        self.answers = []
+
+        def generate(model, prompt, **kwargs):
+            return SimpleNamespace(text=self.answers.pop(0))
+
+        self.provider._generate = generate
+
+    def test_unknown_collection_id_is_not_cached(self):
+        collections = {10: "Videos", 11: "Talks"}
+        self.answers = ['[{"i": 1, "cid": 99}]', '[{"i": 1, "cid": 10}]']
+
+        self.assertEqual(self.provider.classify_bookmarks_batch([("Title", "note")], collections), [None])
+        # Asked again instead of served from cache
+        self.assertEqual(self.provider.classify_bookmarks_batch([("Title", "note")], collections), [10])
+        self.assertEqual(self.answers, [])
+
+    def test_known_collection_id_is_cached(self):
+        collections = {10: "Videos"}
+        self.answers = ['[{"i": 1, "cid": 10}]']
+
+        self.assertEqual(self.provider.classify_bookmarks_batch([("Title", "note")], collections), [10])
+        # Second call is a cache hit; no answer left to consume
+        self.assertEqual(self.provider.classify_bookmarks_batch([("Title", "note")], collections), [10])
+
+
+if __name__ == "__main__":
+    unittest.main()